@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asqlite
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import migrations, statements
+from typing import Awaitable, Callable, List, Tuple
+
+# Compares the trivia score write before and after the upsert change: a SELECT followed by an
+# INSERT or UPDATE against one INSERT ... ON CONFLICT. Run with `python benchmarks/score_upserts.py`
+
+OPERATIONS = 5000
+USERS = 500
+GUILD_ID = 0
+
+Operation = Tuple[int, bool, int]
+
+
+async def select_then_write(conn: asqlite.Connection, ops: List[Operation]) -> None:
+    for user_id, is_correct, streak in ops:
+        res = await conn.fetchone(
+            "SELECT correct, wrong, streak FROM trivia WHERE guild_id = ? AND user_id = ?",
+            (GUILD_ID, user_id),
+        )
+        if not res:
+            await conn.execute(
+                "INSERT INTO trivia (guild_id, user_id, correct, wrong, streak) VALUES (?, ?, ?, ?, ?)",
+                (GUILD_ID, user_id, int(is_correct), int(not is_correct), streak),
+            )
+        else:
+            await conn.execute(
+                "UPDATE trivia SET correct = ?, wrong = ?, streak = ? WHERE guild_id = ? AND user_id = ?",
+                (
+                    res[0] + int(is_correct),
+                    res[1] + int(not is_correct),
+                    max(res[2], streak),
+                    GUILD_ID,
+                    user_id,
+                ),
+            )
+
+
+async def upsert(conn: asqlite.Connection, ops: List[Operation]) -> None:
+    for user_id, is_correct, streak in ops:
+        await conn.execute(
+            statements.TRIVIA_SCORE_UPSERT,
+            (GUILD_ID, user_id, int(is_correct), int(not is_correct), streak),
+        )
+
+
+async def run(
+    name: str,
+    path: Callable[[asqlite.Connection, List[Operation]], Awaitable[None]],
+    ops: List[Operation],
+) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        async with asqlite.connect(os.path.join(directory, "bench.db")) as conn:
+            await migrations.migrate(conn)
+
+            started = time.perf_counter()
+            await path(conn, ops)
+            elapsed = time.perf_counter() - started
+
+            totals = await conn.fetchone(
+                "SELECT SUM(correct), SUM(wrong), MAX(streak) FROM trivia"
+            )
+
+    print(
+        f"{name}: {elapsed / len(ops) * 1e6:.1f}us/op, totals {tuple(totals)}"  # type: ignore
+    )
+
+
+async def main() -> None:
+    rng = random.Random(0)
+    ops = [
+        (rng.randrange(USERS), rng.random() < 0.5, rng.randrange(10))
+        for _ in range(OPERATIONS)
+    ]
+
+    await run("select + write", select_then_write, ops)
+    await run("upsert", upsert, ops)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
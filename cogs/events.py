@@ -8,6 +8,7 @@ errors = commands.errors
 import traceback
 
 from config import reactionSuccess, reactionFailure
+from helpers import statements
 from helpers.errors import EntityDisabled
 from typing import Any, TYPE_CHECKING
 
@@ -30,7 +31,7 @@ class Events(commands.Cog):
             return
 
         if self.bot.user and f"<@{self.bot.user.id}>" in message.content:
-            prefixes = await self.bot._get_prefix(self.bot, message)
+            prefixes = await self.bot.get_guild_prefixes(message.guild.id)
 
             e = discord.Embed(
                 title=f"Prefixes for {message.guild.name}",
@@ -121,21 +122,8 @@ class Events(commands.Cog):
         if message.author.bot or not message.guild:
             return
 
-        if message.guild.id not in self.bot.logging_webhooks:
-            async with self.bot.pool.acquire() as conn:
-                res = await conn.fetchone(
-                    "SELECT log_webhook, log_channel FROM guild_data WHERE guild_id = ?",
-                    (message.guild.id),
-                )
-
-                if not res:
-                    return
-
-                self.bot.logging_webhooks[message.guild.id] = discord.Webhook.from_url(
-                    res[0], session=self.bot._session
-                )
-
-        webhook = self.bot.logging_webhooks[message.guild.id]
+        if not await self.bot.get_logging_webhook(message.guild):
+            return
 
         e = discord.Embed(
             title=":notepad_spiral: Message Deleted",
@@ -152,20 +140,51 @@ class Events(commands.Cog):
         if message.attachments:
             e.set_image(url=message.attachments[0].proxy_url)
 
-        try:
-            await webhook.send(
-                embed=e,
-                username=message.guild.me.display_name,
-                avatar_url=message.guild.me.display_avatar.url,
+        self.bot.log_queue.put(message.guild, e)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ) -> Any:
+        if not payload.guild_id:
+            return
+
+        guild = self.bot.get_guild(payload.guild_id)
+        if not guild or not await self.bot.get_logging_webhook(guild):
+            return
+
+        messages = sorted(
+            [m for m in payload.cached_messages if not m.author.bot],
+            key=lambda m: m.created_at,
+        )
+
+        channel = guild.get_channel_or_thread(payload.channel_id)
+        lines = [
+            f"{len(payload.message_ids)} message(s) deleted in #{channel.name if channel else payload.channel_id}, {len(payload.cached_messages)} of them cached.",
+            "",
+        ]
+        for message in messages:
+            lines.append(
+                f"[{message.created_at:%Y-%m-%d %H:%M:%S}] {message.author} ({message.author.id}): {message.content}"
             )
-        except discord.NotFound:
-            webhook = await self.bot.create_logging_webhook(message.guild)
-            if webhook:
-                await webhook.send(
-                    embed=e,
-                    username=message.guild.me.display_name,
-                    avatar_url=message.guild.me.display_avatar.url,
-                )
+            for attachment in message.attachments:
+                lines.append(f"    Attachment: {attachment.proxy_url}")
+
+        e = discord.Embed(
+            title=":notepad_spiral: Messages Bulk Deleted",
+            description=f"**{len(payload.message_ids)}** messages were **deleted** in <#{payload.channel_id}>. The cached ones are in the attached transcript.",
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+
+        self.bot.log_queue.put(
+            guild,
+            e,
+            file=(
+                f"transcript-{payload.channel_id}.txt",
+                "\n".join(lines).encode("utf-8"),
+            ),
+        )
 
     @commands.Cog.listener()
     async def on_message_edit(
@@ -178,21 +197,8 @@ class Events(commands.Cog):
         if not before.embeds and after.embeds:
             return
 
-        if after.guild.id not in self.bot.logging_webhooks:
-            async with self.bot.pool.acquire() as conn:
-                res = await conn.fetchone(
-                    "SELECT log_webhook, log_channel FROM guild_data WHERE guild_id = ?",
-                    (after.guild.id),
-                )
-
-                if not res:
-                    return
-
-                self.bot.logging_webhooks[after.guild.id] = discord.Webhook.from_url(
-                    res[0], session=self.bot._session
-                )
-
-        webhook = self.bot.logging_webhooks[after.guild.id]
+        if not await self.bot.get_logging_webhook(after.guild):
+            return
 
         e = discord.Embed(
             title=":notepad_spiral: Message Edited",
@@ -206,40 +212,14 @@ class Events(commands.Cog):
             name="After", value=after.content
         )
 
-        try:
-            await webhook.send(
-                embed=e,
-                username=after.guild.me.display_name,
-                avatar_url=after.guild.me.display_avatar.url,
-            )
-        except discord.NotFound:
-            webhook = await self.bot.create_logging_webhook(after.guild)
-            if webhook:
-                await webhook.send(
-                    embed=e,
-                    username=after.guild.me.display_name,
-                    avatar_url=after.guild.me.display_avatar.url,
-                )
+        self.bot.log_queue.put(after.guild, e)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member) -> Any:
         guild = member.guild
 
-        if guild.id not in self.bot.logging_webhooks:
-            async with self.bot.pool.acquire() as conn:
-                res = await conn.fetchone(
-                    "SELECT log_webhook, log_channel FROM guild_data WHERE guild_id = ?",
-                    (guild.id),
-                )
-
-                if not res:
-                    return
-
-                self.bot.logging_webhooks[guild.id] = discord.Webhook.from_url(
-                    res[0], session=self.bot._session
-                )
-
-        webhook = self.bot.logging_webhooks[guild.id]
+        if not await self.bot.get_logging_webhook(guild):
+            return
 
         e = discord.Embed(
             title=":notepad_spiral: Member Left",
@@ -248,27 +228,12 @@ class Events(commands.Cog):
             timestamp=discord.utils.utcnow(),
         )
 
-        try:
-            await webhook.send(
-                embed=e,
-                username=guild.me.display_name,
-                avatar_url=guild.me.display_avatar.url,
-            )
-        except discord.NotFound:
-            webhook = await self.bot.create_logging_webhook(guild)
-            if webhook:
-                await webhook.send(
-                    embed=e,
-                    username=guild.me.display_name,
-                    avatar_url=guild.me.display_avatar.url,
-                )
+        self.bot.log_queue.put(guild, e)
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild) -> Any:
         async with self.bot.pool.acquire() as conn:
-            await conn.execute(
-                "INSERT INTO guild_data (guild_id) VALUES (?)", (guild.id)
-            )
+            await conn.execute(statements.ADD_GUILD, (guild.id))
 
 
 async def setup(bot: Jovanes) -> None:
@@ -6,19 +6,26 @@ from discord import app_commands
 
 import random
 import os
+import hashlib
+import time
 import aiohttp
-import pathlib
 import asyncio
 
-from babel import Locale
-from typing import Dict, Union, Optional, Any, TYPE_CHECKING
+from babel import Locale, UnknownLocaleError
+from typing import Dict, List, Tuple, Union, Optional, Any, TYPE_CHECKING
 from helpers import utils as _utils
-from langdetect import detect
 from copy import deepcopy
 
 if TYPE_CHECKING:
     from ..main import Jovanes
 
+# Request limits of the translator API, kept below the documented maximums
+MAX_BATCH_ITEMS = 100
+MAX_BATCH_CHARACTERS = 10000
+
+# Discord's limit for an embed description
+MAX_EMBED_DESCRIPTION = 4096
+
 
 class Fun(commands.Cog):
     def __init__(self, bot: Jovanes) -> None:
@@ -52,31 +59,80 @@ class Fun(commands.Cog):
             "Very doubtful.",
         ]
         self._session = self.bot._session
-        self.snipe_data = self.bot.snipe_data
+        self.snipe_store = self.bot.snipe_store
         self.snipe_tasks: Dict[int, asyncio.Task] = {}
         self.who_say: Dict[int, int] = {}
         self.sniped_image: Optional[discord.Message] = None
 
+    async def cog_load(self) -> None:
+        self.prune_attachments.start()
+
+    async def cog_unload(self) -> None:
+        self.prune_attachments.cancel()
+
+    @tasks.loop(minutes=5)
+    async def prune_attachments(self) -> None:
+        self.bot.attachment_cache.prune()
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> Any:
         if not message.attachments:
             return
 
-        file = message.attachments[0]
-        if not os.path.exists("./images"):
-            os.mkdir("./images")
+        cache = self.bot.attachment_cache
+        attachment = message.attachments[0]
 
-        _format = file.filename.split(".")[::-1][0]
-        await file.save(pathlib.Path(f"./images/{message.id}.{_format}"))
+        mode = self.bot.capture_modes.get(message.guild.id) if message.guild else None
+        if mode == "lazy":
+            cache.remember(message.id, attachment)
+        else:
+            cache.capture(message.id, attachment)
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message) -> Any:
         if not message.guild:
             return
 
-        self.snipe_data[message.channel.id] = message
+        self.snipe_store.add(message.channel.id, message)
+
+        if message.id in self.bot.attachment_cache.pending:
+            await self.bot.attachment_cache.fetch_pending(message.id)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ) -> Any:
+        if not payload.guild_id:
+            return
+
+        # A purge only needs one store update for the whole batch
+        if payload.cached_messages:
+            self.snipe_store.extend(payload.channel_id, payload.cached_messages)
+
+        # Lazy captures are keyed by message ID, so they are fetched even when the messages weren't cached
+        cache = self.bot.attachment_cache
+        pending = [
+            message_id
+            for message_id in payload.message_ids
+            if message_id in cache.pending
+        ]
+        if pending:
+            await asyncio.gather(
+                *(cache.fetch_pending(message_id) for message_id in pending)
+            )
+
+    def _translation_key(self, to_lang: str, text: str) -> Tuple[str, str]:
+        return (hashlib.sha256(text.encode("utf-8")).hexdigest(), to_lang)
 
     async def _translate(self, to_lang: str, text: str) -> Dict[str, str]:
+        # Only real translations are cached, errors and missing keys are retried next time
+        return await self.bot.translation_cache.get_or_fetch(
+            self._translation_key(to_lang, text),
+            lambda: self._request_translations(to_lang, [text]),
+            cache_if=lambda data: isinstance(data, list),
+        )
+
+    async def _request_translations(self, to_lang: str, texts: List[str]) -> Any:
         api_key = os.getenv("RAPIDAPI_KEY")
         if not api_key:
             return {}
@@ -90,7 +146,7 @@ class Fun(commands.Cog):
             "profanityAction": "NoAction",
         }
 
-        payload = [{"Text": text}]
+        payload = [{"Text": text} for text in texts]
         headers = {
             "content-type": "application/json",
             "X-RapidAPI-Key": api_key,
@@ -102,17 +158,56 @@ class Fun(commands.Cog):
         data = await resp.json()
         return data
 
+    async def _translate_batch(self, to_lang: str, texts: List[str]) -> List[str]:
+        cache = self.bot.translation_cache
+        keys = [self._translation_key(to_lang, text) for text in texts]
+
+        # Texts that miss the cache and aren't being fetched by anyone else go upstream together
+        batch: Dict[Tuple[str, str], str] = {}
+        request: List[asyncio.Task] = []
+
+        async def send() -> Any:
+            return await self._request_translations(to_lang, list(batch.values()))
+
+        async def fetch(key: Tuple[str, str], text: str) -> Any:
+            position = len(batch)
+            batch[key] = text
+            if not request:
+                # Runs on the next loop iteration, once every miss of this batch has been added
+                request.append(asyncio.create_task(send()))
+
+            data = await asyncio.shield(request[0])
+            if not isinstance(data, list):
+                return data
+
+            # Every element is cached the same way a single translation would be
+            return [data[position]]
+
+        # Going through get_or_fetch counts hits and misses and shares texts other callers are fetching
+        results = await asyncio.gather(
+            *(
+                cache.get_or_fetch(
+                    key,
+                    lambda key=key, text=text: fetch(key, text),
+                    cache_if=lambda data: isinstance(data, list),
+                )
+                for key, text in zip(keys, texts)
+            )
+        )
+        return [result[0]["translations"][0]["text"] for result in results]
+
     async def _context_translate(
         self, interaction: discord.Interaction[Jovanes], message: discord.Message
     ):
         await interaction.response.defer(thinking=True)
 
         source_lang = None
-        try:
-            detected = detect(message.content)
-            source_lang = Locale(detected[:2])
-        except:
-            pass
+        detected = await self.bot.language_detector.detect(message.content)
+        if detected:
+            try:
+                source_lang = Locale(detected[:2])
+            except:
+                pass
 
         to_lang = Locale(interaction.locale.value[:2])
 
@@ -175,6 +270,73 @@ class Fun(commands.Cog):
         )
         await interaction.followup.send(embed=e)
 
+    @commands.command(
+        name="translatehistory",
+        description="Translates the last messages in the channel or thread.",
+        aliases=["th"],
+    )
+    @commands.cooldown(1, 30.0, commands.BucketType.channel)
+    async def translatehistory(
+        self, ctx: commands.Context[Jovanes], amount: int, language: str = "en"
+    ) -> Any:
+        if amount < 1 or amount > 100:
+            await ctx.reply("Amount has to be between 1 and 100.")
+            return
+
+        try:
+            to_lang = Locale(language[:2])
+        except (ValueError, UnknownLocaleError):
+            await ctx.reply(f"`{language}` is not a valid language.")
+            return
+
+        messages = [
+            m
+            async for m in ctx.channel.history(limit=amount, before=ctx.message)
+            if m.content
+        ][::-1]
+        if not messages:
+            await ctx.reply("There are no messages with text to translate.")
+            return
+
+        texts = [m.content for m in messages]
+        batches = _utils.pack_batches(texts, MAX_BATCH_ITEMS, MAX_BATCH_CHARACTERS)
+
+        for i, batch in enumerate(batches, start=1):
+            started = time.perf_counter()
+            try:
+                translations = await self._translate_batch(
+                    to_lang.language, [texts[j] for j in batch]
+                )
+            except aiohttp.ClientPayloadError:
+                await ctx.reply(f"Batch {i} couldn't be translated. It's too long.")
+                return
+            except (KeyError, IndexError, TypeError):
+                await ctx.reply("No translations were received from the API.")
+                return
+
+            latency = (time.perf_counter() - started) * 1000
+
+            # Results are sent as soon as each batch arrives
+            lines = [
+                f"**{messages[j].author.display_name}**: {translation}"
+                for j, translation in zip(batch, translations)
+            ]
+            # A full batch is larger than one embed description, the rest goes into follow-up embeds
+            pages = _utils.pack_lines(lines, MAX_EMBED_DESCRIPTION)
+            for page, description in enumerate(pages, start=1):
+                e = discord.Embed(
+                    title=f"Translation to {to_lang.display_name}",
+                    description=description,
+                    color=discord.Color.blue(),
+                    timestamp=discord.utils.utcnow(),
+                )
+
+                footer = f"Batch {i}/{len(batches)} | {len(batch)} message(s) | {latency:.0f} ms"
+                if len(pages) > 1:
+                    footer += f" | Page {page}/{len(pages)}"
+                e.set_footer(text=footer)
+                await ctx.send(embed=e)
+
     def get_size(self) -> str:
         chance = random.randint(1, 100)
         if chance < 50:
@@ -350,57 +512,62 @@ class Fun(commands.Cog):
         e.add_field(name="Answer", value=response, inline=False)
         await ctx.send(embed=e)
 
-    @commands.command(description="Shows the last deleted message in a channel.")
-    async def snipe(self, ctx: commands.Context[Jovanes]) -> Any:
-        if ctx.channel.id not in self.snipe_data:
-            await ctx.reply("No message were deleted in this channel recently.")
+    @commands.command(
+        description="Shows the last deleted message in a channel, or an older one from the history."
+    )
+    async def snipe(self, ctx: commands.Context[Jovanes], index: int = 1) -> Any:
+        message = self.snipe_store.get(ctx.channel.id, index)
+        if not message:
+            total = self.snipe_store.history_length(ctx.channel.id)
+            if not total:
+                await ctx.reply("No message were deleted in this channel recently.")
+            else:
+                await ctx.reply(
+                    f"Only {total} deleted message(s) are stored for this channel."
+                )
             return
 
-        message = self.snipe_data[ctx.channel.id]
-
         e = discord.Embed(color=discord.Color.blue())
-        e.set_author(
-            name=message.author.display_name, icon_url=message.author.display_avatar
-        )
+        e.set_author(name=message.author_name, icon_url=message.author_avatar)
         e.timestamp = message.created_at
         e.description = message.content if message.content else ""
 
-        if message.attachments:
-            filename = message.attachments[0].filename
-            _format = filename.split(".")[::-1][0]
+        if message.attachment:
+            filename = message.attachment
             e.description = filename
-            try:
-                file = discord.File(
-                    f"./images/{message.id}.{_format}", filename=filename
-                )
-            except:
+
+            cached = self.bot.attachment_cache.get(message.id)
+            if not cached:
                 await ctx.reply(embed=e)
             else:
+                _format = cached.extension
+                file = discord.File(cached.path, filename=filename)
+
                 if _format in ("jpg", "jpeg", "png", "webp", "bmp"):
                     e.set_image(url=f"attachment://{filename}")
                     await ctx.reply(file=file, embed=e)
 
                 elif _format in ("ogg"):
                     await ctx.reply(
-                        f"Voice message sent by: {message.author.mention}", file=file
+                        f"Voice message sent by: <@{message.author_id}>", file=file
                     )
                 else:
                     await ctx.reply(
-                        f"Video sent by: {message.author.mention}",
+                        f"Video sent by: <@{message.author_id}>",
                         allowed_mentions=discord.AllowedMentions.none(),
                         file=file,
                     )
             return
 
-        if message.embeds:
-            if message.embeds[0].url:
-                await ctx.reply(
-                    f"File sent by {message.author.mention}.\n{message.embeds[0].url}",
-                    allowed_mentions=discord.AllowedMentions.none(),
-                )
-                return
+        if message.embed_url:
+            await ctx.reply(
+                f"File sent by <@{message.author_id}>.\n{message.embed_url}",
+                allowed_mentions=discord.AllowedMentions.none(),
+            )
+            return
 
-            e.description += f"\n{message.embeds[0].description}"
+        if message.embed_description:
+            e.description += f"\n{message.embed_description}"
 
         await ctx.reply(embed=e)
 
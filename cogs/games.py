@@ -6,15 +6,16 @@ from discord import app_commands
 
 import random
 
-from helpers import utils as _utils, views
+from helpers import utils as _utils, views, leaderboards, statements
+from helpers.trivia import TRIVIA_TYPES, TRIVIA_DIFFICULTIES
 from config import reactionFailure, reactionSuccess
 
-from typing import Any, Dict, Optional, Union, TYPE_CHECKING
+from typing import Any, List, Literal, Optional, Tuple, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..main import Jovanes
 
-TRIVIA_URL = "https://opentdb.com/api.php?amount=1"
+LeaderboardScope = Literal["global", "server"]
 
 
 class Games(commands.Cog):
@@ -32,16 +33,25 @@ class Games(commands.Cog):
             case _:
                 return 10
 
-    def get_leaderboard_emoji(self, pos):
-        match pos:
-            case 1:
-                return "\U0001f947"
-            case 2:
-                return "\U0001f948"
-            case 3:
-                return "\U0001f949"
-            case _:
-                return "*"
+    async def send_leaderboard(
+        self,
+        ctx: commands.Context[Jovanes],
+        leaderboard: leaderboards.Leaderboard,
+        scope: LeaderboardScope,
+        *,
+        fields: Optional[List[Tuple[str, str]]] = None,
+    ) -> None:
+        await self.bot.results.flush()
+
+        guild = ctx.guild if scope == "server" else None
+        total = await leaderboard.count(
+            self.bot, guild.id if guild else _utils.GLOBAL_SCOPE
+        )
+
+        view = views.LeaderboardPaginator(
+            self.bot, leaderboard, total, guild=guild, fields=fields
+        )
+        await view.start(ctx)
 
     @commands.command(
         name="trivia",
@@ -49,21 +59,37 @@ class Games(commands.Cog):
     )
     @commands.guild_only()
     @commands.cooldown(1, 5.0, commands.BucketType.user)
-    async def trivia(self, ctx: commands.Context[Jovanes]) -> None:
+    async def trivia(
+        self, ctx: commands.Context[Jovanes], difficulty: Optional[str] = None
+    ) -> None:
         assert isinstance(ctx.author, discord.Member)
 
+        if difficulty:
+            difficulty = difficulty.lower()
+            if difficulty not in TRIVIA_DIFFICULTIES:
+                await ctx.reply(
+                    f"Difficulty must be one of {', '.join(f'`{d}`' for d in TRIVIA_DIFFICULTIES)}."
+                )
+                return
+
         await ctx.defer()
 
-        _type = random.choice(["boolean", "multiple"])
+        _type = random.choice(TRIVIA_TYPES)
 
-        url = TRIVIA_URL + f"&type={_type}"
+        # The local bank is the common path, the pool is only used for questions the user has seen all of
+        data = await self.bot.trivia_bank.sample(ctx.author.id, _type, difficulty)
+        if not data:
+            try:
+                data = await self.bot.trivia_pool.get(_type, difficulty)
+            except LookupError:
+                await ctx.send("No trivia questions are available right now.")
+                return
 
-        res = await self.bot._session.get(url)
-        data = await res.json()
+            await self.bot.trivia_bank.add([data], seen_by=ctx.author.id)
 
-        category = _utils.sanitize_response(data["results"][0]["category"])
-        difficulty = _utils.sanitize_response(data["results"][0]["difficulty"])
-        question = _utils.sanitize_response(data["results"][0]["question"])
+        category = _utils.sanitize_response(data["category"])
+        difficulty = _utils.sanitize_response(data["difficulty"])
+        question = _utils.sanitize_response(data["question"])
         time = self.get_trivia_time(difficulty)
 
         e = discord.Embed(
@@ -78,23 +104,17 @@ class Games(commands.Cog):
         e.set_author(name=f"{ctx.author.name}'s Trivia", icon_url=ctx.author.avatar)
 
         if _type == "boolean":
-            correct_answer = _utils.sanitize_response(
-                data["results"][0]["correct_answer"]
-            )
-            incorrect_answer = _utils.sanitize_response(
-                data["results"][0]["incorrect_answers"][0]
-            )
+            correct_answer = _utils.sanitize_response(data["correct_answer"])
+            incorrect_answer = _utils.sanitize_response(data["incorrect_answers"][0])
             view = views.TriviaBool(
                 self.bot, ctx.author, correct_answer, incorrect_answer, e, time
             )
         else:
-            correct_answer = _utils.sanitize_response(
-                data["results"][0]["correct_answer"]
-            )
+            correct_answer = _utils.sanitize_response(data["correct_answer"])
             incorrect_answers = []
             for i in range(3):
                 incorrect_answers.append(
-                    _utils.sanitize_response(data["results"][0]["incorrect_answers"][i])
+                    _utils.sanitize_response(data["incorrect_answers"][i])
                 )
             view = views.TriviaMultiple(
                 self.bot, ctx.author, correct_answer, incorrect_answers, e, time
@@ -104,66 +124,40 @@ class Games(commands.Cog):
 
     @commands.group(
         name="trivialb",
-        description="The global leaderboard for the trivia.",
+        description="The global or server leaderboard for the trivia.",
         invoke_without_command=True,
     )
     @commands.guild_only()
-    async def trivialb(self, ctx: commands.Context[Jovanes]) -> None:
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchall(
-                "SELECT user_id, correct, wrong, streak FROM trivia ORDER BY correct DESC"
-            )
-
-        e = discord.Embed(
-            title="Trivia Leaderboard",
-            color=discord.Color.random(),
-            timestamp=discord.utils.utcnow(),
-        )
-        e.description = ""
-
-        for i, user in enumerate(res, start=1):
-            e.description += f"{self.get_leaderboard_emoji(i)} <@{user[0]}> (Correct: {user[1]}, Wrong: {user[2]}, Streak: {user[3]})\n"  # type: ignore
-
-        await ctx.send(embed=e)
+    async def trivialb(
+        self, ctx: commands.Context[Jovanes], scope: LeaderboardScope = "global"
+    ) -> None:
+        await self.send_leaderboard(ctx, leaderboards.TRIVIA, scope)
 
     @trivialb.command(name="stats", aliases=["s"])
-    async def trivialb_stats(self, ctx: commands.Context[Jovanes]) -> None:
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchall(
-                "SELECT user_id, correct, wrong, streak FROM trivia ORDER BY correct DESC"
-            )
+    async def trivialb_stats(
+        self, ctx: commands.Context[Jovanes], scope: LeaderboardScope = "global"
+    ) -> None:
+        await self.bot.results.flush()
 
-        e = discord.Embed(
-            title="Trivia Leaderboard",
-            color=discord.Color.random(),
-            timestamp=discord.utils.utcnow(),
+        guild_id = (
+            ctx.guild.id if ctx.guild and scope == "server" else _utils.GLOBAL_SCOPE
         )
-        e.description = ""
+        unranked = leaderboards.TRIVIA_UNRANKED
+        rows = await unranked.fetch_at(self.bot, guild_id, 0, leaderboards.PAGE_SIZE)
+        fields = []
+        if rows:
+            value = "\n".join(
+                unranked.format(i, row) for i, row in enumerate(rows, start=1)
+            )
+            remaining = await unranked.count(self.bot, guild_id) - len(rows)
+            if remaining > 0:
+                value += f"\n... and {remaining} more"
 
-        ignored = {}
-        percentages = {}
-        for user in res:
-            if (user[1] + user[2]) > 50:
-                percentages[user[0]] = (user[1] / (user[1] + user[2])) * 100
-            else:
-                ignored[user[0]] = (user[1] / (user[1] + user[2])) * 100
+            fields.append(("Ignored (answered less than 50 questions)", value))
 
-        percentages = dict(
-            sorted(percentages.items(), key=lambda x: float(x[1]), reverse=True)
+        await self.send_leaderboard(
+            ctx, leaderboards.TRIVIA_ACCURACY, scope, fields=fields
         )
-        for i, (k, v) in enumerate(percentages.items(), start=1):
-            e.description += f"{self.get_leaderboard_emoji(i)} <@{k}> (Percentage: **{v:.2f}%**)\n"  # type: ignore
-
-        if ignored:
-            val = [
-                f"{self.get_leaderboard_emoji(i)} <@{k}> (Percentage: **{v:.2f}%**)"
-                for i, (k, v) in enumerate(ignored.items(), start=1)
-            ]
-            e.add_field(
-                name="Ignored (answered less than 50 questions)", value="\n".join(val)
-            )
-
-        await ctx.send(embed=e)
 
     @commands.command(name="memory", description="Starts a memory game with the bot.")
     @commands.guild_only()
@@ -176,27 +170,14 @@ class Games(commands.Cog):
 
     @commands.group(
         name="memorylb",
-        description="The global leaderboard for the memory game.",
+        description="The global or server leaderboard for the memory game.",
         invoke_without_command=True,
     )
     @commands.guild_only()
-    async def memorylb(self, ctx: commands.Context) -> None:
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchall(
-                "SELECT user_id, minutes, seconds, total_seconds FROM memory ORDER BY total_seconds ASC"
-            )
-
-        e = discord.Embed(
-            title="Memory Leaderboard",
-            color=discord.Color.random(),
-            timestamp=discord.utils.utcnow(),
-        )
-        e.description = ""
-
-        for i, user in enumerate(res, start=1):
-            e.description += f"{self.get_leaderboard_emoji(i)} <@{user[0]}> (Time: {user[1]} minute(s), {user[2]} second(s))\n"  # type: ignore
-
-        await ctx.send(embed=e)
+    async def memorylb(
+        self, ctx: commands.Context[Jovanes], scope: LeaderboardScope = "global"
+    ) -> None:
+        await self.send_leaderboard(ctx, leaderboards.MEMORY, scope)
 
     @commands.command(
         name="tictactoe",
@@ -228,40 +209,14 @@ class Games(commands.Cog):
 
     @commands.group(
         name="tictactoelb",
-        description="The global leaderboard for tic-tac-toe.",
+        description="The global or server leaderboard for tic-tac-toe.",
         invoke_without_command=True,
     )
     @commands.guild_only()
-    async def tictactoelb(self, ctx: commands.Context[Jovanes]) -> None:
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchall("SELECT winner FROM tictactoe")
-
-        user_data: Dict[int, int] = {}
-
-        e = discord.Embed(
-            title="Tic-Tac-Toe Leaderboard",
-            color=discord.Color.random(),
-            timestamp=discord.utils.utcnow(),
-        )
-        e.description = ""
-
-        if not res:
-            e.description = "No one won any matches."
-        else:
-            for row in res:
-                try:
-                    user_data[row[0]] += 1
-                except:
-                    user_data[row[0]] = 1
-
-            user_data = dict(
-                sorted(user_data.items(), key=lambda x: x[1], reverse=True)
-            )
-
-            for i, (k, v) in enumerate(user_data.items(), start=1):
-                e.description += f"{self.get_leaderboard_emoji(i)} <@{k}> (Wins: {v})\n"  # type: ignore
-
-        await ctx.send(embed=e)
+    async def tictactoelb(
+        self, ctx: commands.Context[Jovanes], scope: LeaderboardScope = "global"
+    ) -> None:
+        await self.send_leaderboard(ctx, leaderboards.TICTACTOE, scope)
 
     @tictactoelb.command(
         name="info", description="Shows the individual match information of a user."
@@ -272,10 +227,10 @@ class Games(commands.Cog):
         assert isinstance(ctx.author, discord.Member)
         member = member or ctx.author
 
+        await self.bot.results.flush()
         async with self.bot.pool.acquire() as conn:
             res = await conn.fetchall(
-                "SELECT winner, rival FROM tictactoe WHERE winner = ? OR rival = ?",
-                (member.id, member.id),
+                statements.TICTACTOE_MATCHES, (member.id, member.id)
             )
 
         e = discord.Embed(
@@ -324,40 +279,14 @@ class Games(commands.Cog):
 
     @commands.group(
         name="rpslb",
-        description="The global leaderboard for rock-paper-scissors.",
+        description="The global or server leaderboard for rock-paper-scissors.",
         invoke_without_command=True,
     )
     @commands.guild_only()
-    async def rpslb(self, ctx: commands.Context[Jovanes]) -> None:
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchall("SELECT winner FROM rps")
-
-        user_data: Dict[int, int] = {}
-
-        e = discord.Embed(
-            title="RPS Leaderboard",
-            color=discord.Color.random(),
-            timestamp=discord.utils.utcnow(),
-        )
-        e.description = ""
-
-        if not res:
-            e.description = "No one won any matches."
-        else:
-            for row in res:
-                try:
-                    user_data[row[0]] += 1
-                except:
-                    user_data[row[0]] = 1
-
-            user_data = dict(
-                sorted(user_data.items(), key=lambda x: x[1], reverse=True)
-            )
-
-            for i, (k, v) in enumerate(user_data.items(), start=1):
-                e.description += f"{self.get_leaderboard_emoji(i)} <@{k}> (Wins: {v})\n"  # type: ignore
-
-        await ctx.send(embed=e)
+    async def rpslb(
+        self, ctx: commands.Context[Jovanes], scope: LeaderboardScope = "global"
+    ) -> None:
+        await self.send_leaderboard(ctx, leaderboards.RPS, scope)
 
     @rpslb.command(
         name="info", description="Shows the individual match information of a user."
@@ -368,11 +297,9 @@ class Games(commands.Cog):
         assert isinstance(ctx.author, discord.Member)
         member = member or ctx.author
 
+        await self.bot.results.flush()
         async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchall(
-                "SELECT winner, rival FROM rps WHERE winner = ? OR rival = ?",
-                (member.id, member.id),
-            )
+            res = await conn.fetchall(statements.RPS_MATCHES, (member.id, member.id))
 
         e = discord.Embed(
             title="RPS Individual Match Info",
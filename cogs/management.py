@@ -3,7 +3,8 @@ from __future__ import annotations
 import discord
 from discord.ext import commands
 
-from helpers import views
+from helpers import statements, views
+from helpers.attachments import CAPTURE_MODES
 from config import reactionFailure, reactionSuccess
 from typing import Any, TYPE_CHECKING
 
@@ -45,30 +46,21 @@ class Management(commands.Cog):
         else:
             _type = "command"
 
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchone(
-                "SELECT entity FROM configuration WHERE entity = ? AND guild_id = ?",
-                (entity, ctx.guild.id),
-            )
-
-            if not res:
-                e = discord.Embed(
-                    description=f"{reactionFailure} This **{_type}** is not disabled.",
-                    color=discord.Color.red(),
-                )
-                await ctx.reply(embed=e)
-                return
-
-            await conn.execute(
-                "DELETE FROM configuration WHERE entity = ? AND guild_id = ?",
-                (entity, ctx.guild.id),
-            )
-
+        if not self.bot.is_entity_disabled(resolved_entity, ctx.guild.id):
             e = discord.Embed(
-                description=f"{reactionSuccess} {_type.capitalize()} **{resolved_entity.qualified_name}** has been enabled.",
-                color=discord.Color.green(),
+                description=f"{reactionFailure} This **{_type}** is not disabled.",
+                color=discord.Color.red(),
             )
             await ctx.reply(embed=e)
+            return
+
+        await self.bot.enable_entity(ctx.guild.id, resolved_entity.qualified_name)
+
+        e = discord.Embed(
+            description=f"{reactionSuccess} {_type.capitalize()} **{resolved_entity.qualified_name}** has been enabled.",
+            color=discord.Color.green(),
+        )
+        await ctx.reply(embed=e)
 
     @commands.command(
         name="disable", description="Renders a command/module unusable in the guild."
@@ -109,30 +101,21 @@ class Management(commands.Cog):
             await ctx.reply(embed=e)
             return
 
-        async with self.bot.pool.acquire() as conn:
-            res = await conn.fetchone(
-                "SELECT entity FROM configuration WHERE entity = ? AND guild_id = ?",
-                (entity, ctx.guild.id),
-            )
-
-            if res:
-                e = discord.Embed(
-                    description=f"{reactionFailure} This **{_type}** is already disabled.",
-                    color=discord.Color.red(),
-                )
-                await ctx.reply(embed=e)
-                return
-
-            await conn.execute(
-                "INSERT INTO configuration (guild_id, entity, disabled) VALUES (?, ?, ?)",
-                (ctx.guild.id, entity, 1),
-            )
-
+        if self.bot.is_entity_disabled(resolved_entity, ctx.guild.id):
             e = discord.Embed(
-                description=f"{reactionSuccess} {_type.capitalize()} **{resolved_entity.qualified_name}** has been disabled.",
-                color=discord.Color.green(),
+                description=f"{reactionFailure} This **{_type}** is already disabled.",
+                color=discord.Color.red(),
             )
             await ctx.reply(embed=e)
+            return
+
+        await self.bot.disable_entity(ctx.guild.id, resolved_entity.qualified_name)
+
+        e = discord.Embed(
+            description=f"{reactionSuccess} {_type.capitalize()} **{resolved_entity.qualified_name}** has been disabled.",
+            color=discord.Color.green(),
+        )
+        await ctx.reply(embed=e)
 
     @commands.group(
         name="prefix",
@@ -157,7 +140,7 @@ class Management(commands.Cog):
             await ctx.reply(embed=e)
             return
 
-        prefixes = await self.bot._get_prefix(self.bot, ctx.message)
+        prefixes = await self.bot.get_guild_prefixes(ctx.guild.id)
 
         if len(prefixes) > 5:
             e = discord.Embed(
@@ -176,11 +159,7 @@ class Management(commands.Cog):
                 await ctx.reply(embed=e)
                 return
 
-        async with self.bot.pool.acquire() as conn:
-            await conn.execute(
-                "INSERT INTO prefixes (guild_id, prefix) VALUES (?, ?)",
-                (ctx.guild.id, prefix),
-            )
+        await self.bot.add_prefix(ctx.guild.id, prefix)
 
         e = discord.Embed(
             description=f'{reactionSuccess} Added `{prefix}` to the list of prefixes.\n\nNote: If the prefix contains more than one word, it should be wrapped in quotes. E.g. `"two words"`. If you\'d like a whitespace after the end of the prefix, wrap it in quotes and leave a space at the end. E.g. `"two words "`.',
@@ -193,7 +172,7 @@ class Management(commands.Cog):
     async def prefix_remove(self, ctx: commands.Context[Jovanes]) -> Any:
         assert ctx.guild
 
-        prefixes = await self.bot._get_prefix(self.bot, ctx.message)
+        prefixes = await self.bot.get_guild_prefixes(ctx.guild.id)
 
         if len(prefixes) == 1:
             e = discord.Embed(
@@ -239,8 +218,7 @@ class Management(commands.Cog):
 
         async with self.bot.pool.acquire() as conn:
             await conn.execute(
-                "UPDATE guild_data SET log_channel = ?, log_webhook = ? WHERE guild_id = ?",
-                (channel.id, webhook.url, ctx.guild.id),
+                statements.SET_LOGGING, (channel.id, webhook.url, ctx.guild.id)
             )
 
         e = discord.Embed(
@@ -249,6 +227,32 @@ class Management(commands.Cog):
         )
         await ctx.reply(embed=e)
 
+    @commands.command(
+        name="capturemode",
+        description="Sets whether attachments are downloaded when they're sent (eager) or only when they're deleted (lazy).",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def capturemode(self, ctx: commands.Context[Jovanes], mode: str) -> Any:
+        assert ctx.guild
+
+        mode = mode.lower()
+        if mode not in CAPTURE_MODES:
+            e = discord.Embed(
+                description=f"{reactionFailure} Capture mode must be one of {', '.join(f'`{m}`' for m in CAPTURE_MODES)}.",
+                color=discord.Color.red(),
+            )
+            await ctx.reply(embed=e)
+            return
+
+        await self.bot.set_capture_mode(ctx.guild.id, mode)
+
+        e = discord.Embed(
+            description=f"{reactionSuccess} Attachment capture mode has been set to **{mode}**.",
+            color=discord.Color.green(),
+        )
+        await ctx.reply(embed=e)
+
 
 async def setup(bot: Jovanes) -> None:
     await bot.add_cog(Management(bot))
@@ -4,10 +4,12 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 
-import shutil
-import os
+import io
+import json
 
-from typing import TYPE_CHECKING
+from helpers import leaderboards, statements
+from helpers.attachments import MB
+from typing import Literal, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..main import Jovanes
@@ -26,10 +28,271 @@ class Owner(commands.Cog):
     @commands.command(description="Clears the local image cache.")
     @commands.is_owner()
     async def clearimages(self, ctx: commands.Context[Jovanes]) -> None:
-        shutil.rmtree("./images")
-        os.mkdir("./images")
+        self.bot.attachment_cache.clear()
         await ctx.message.add_reaction("✅")
 
+    @commands.command(description="Shows the hit rates of the in-memory caches.")
+    @commands.is_owner()
+    async def cachestats(self, ctx: commands.Context[Jovanes]) -> None:
+        hits, misses = self.bot.prefix_cache_hits, self.bot.prefix_cache_misses
+        total = hits + misses
+
+        e = discord.Embed(
+            title="Cache Stats",
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+        e.add_field(
+            name="Prefixes",
+            value=f"Guilds: {len(self.bot.prefix_cache)}\nHits: {hits}\nMisses: {misses}\nHit Rate: {(hits / total * 100) if total else 0:.2f}%",
+        )
+
+        translations = self.bot.translation_cache
+        e.add_field(
+            name="Translations",
+            value=f"Entries: {len(translations)}/{translations.maxsize}\nHits: {translations.hits}\nMisses: {translations.misses}\nCoalesced: {translations.coalesced}\nHit Rate: {translations.hit_rate:.2f}%",
+        )
+
+        detector = self.bot.language_detector
+        detections = detector.cache
+        e.add_field(
+            name="Language Detection",
+            value=f"Entries: {len(detections)}/{detections.maxsize}\nHits: {detections.hits}\nMisses: {detections.misses}\nTimeouts: {detector.timeouts}\nHit Rate: {detections.hit_rate:.2f}%",
+        )
+
+        accuracy = leaderboards.TRIVIA_ACCURACY.cache
+        if accuracy is not None:
+            e.add_field(
+                name="Trivia Accuracy",
+                value=f"Entries: {len(accuracy)}/{accuracy.maxsize}\nHits: {accuracy.hits}\nMisses: {accuracy.misses}\nHit Rate: {accuracy.hit_rate:.2f}%",
+            )
+        await ctx.send(embed=e)
+
+    @commands.command(description="Shows the SQLite settings and WAL maintenance.")
+    @commands.is_owner()
+    async def dbstats(self, ctx: commands.Context[Jovanes]) -> None:
+        maintenance = self.bot.db_maintenance
+
+        async with self.bot.pool.acquire() as conn:
+            settings = {
+                pragma: (await conn.fetchone(f"PRAGMA {pragma}"))[0]
+                for pragma in (
+                    "journal_mode",
+                    "synchronous",
+                    "mmap_size",
+                    "cache_size",
+                    "temp_store",
+                    "busy_timeout",
+                )
+            }
+
+        e = discord.Embed(
+            title="Database Stats",
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+        e.add_field(
+            name="Connection Profile",
+            value="\n".join(f"{name}: `{value}`" for name, value in settings.items()),
+        )
+
+        if maintenance.last_checkpoint:
+            busy, frames, checkpointed = maintenance.last_checkpoint
+            last = f"Busy: {busy}\nWAL Frames: {frames}\nCheckpointed: {checkpointed}"
+        else:
+            last = "No checkpoint yet."
+
+        e.add_field(
+            name="Maintenance",
+            value=f"Checkpoints: {maintenance.checkpoints}\nOptimizations: {maintenance.optimizations}\n{last}",
+        )
+
+        pool = self.bot.pool
+        waits = pool.stats.acquires["writer"]
+        e.add_field(
+            name="Routing",
+            value=f"Reads: {pool.reads}\nWrites: {pool.writes}\nReaders: {pool.size}\nAvg. Writer Wait: {waits.average:.2f}ms",
+        )
+        await ctx.send(embed=e)
+
+    @commands.command(description="Shows the slowest query shapes and pool waits.")
+    @commands.is_owner()
+    async def querystats(
+        self,
+        ctx: commands.Context[Jovanes],
+        sort: Literal["total", "average", "max", "calls", "rows"] = "total",
+    ) -> None:
+        stats = self.bot.pool.stats
+
+        e = discord.Embed(
+            title="Query Stats",
+            description=f"Sorted by {sort}, slow threshold {stats.slow_threshold:g}ms.",
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+
+        for shape in stats.top(5, key=sort):
+            latency = shape.latency
+            sql = shape.sql if len(shape.sql) <= 200 else f"{shape.sql[:197]}..."
+            e.add_field(
+                name=f"{latency.count} call(s), {latency.total:.1f}ms total",
+                value=f"```sql\n{sql}```Avg: {latency.average:.2f}ms, p95: {latency.percentile(95):g}ms, Max: {latency.max:.2f}ms\nRows: {shape.rows}, Errors: {shape.errors}",
+                inline=False,
+            )
+
+        for pool, waits in stats.acquires.items():
+            e.add_field(
+                name=f"{pool.title()} Acquire",
+                value=f"Count: {waits.count}\nAvg: {waits.average:.2f}ms\np95: {waits.percentile(95):g}ms\nMax: {waits.max:.2f}ms",
+            )
+
+        e.add_field(name="Slow Queries", value=str(len(stats.slow)))
+        await ctx.send(embed=e)
+
+    @commands.command(description="Sends the query stats as JSON.")
+    @commands.is_owner()
+    async def querydump(
+        self, ctx: commands.Context[Jovanes], reset: bool = False
+    ) -> None:
+        stats = self.bot.pool.stats
+        data = json.dumps(stats.to_dict(), indent=2).encode()
+
+        if reset:
+            stats.reset()
+
+        await ctx.send(file=discord.File(io.BytesIO(data), filename="querystats.json"))
+
+    @commands.command(
+        description="Checks the query plan of every registered statement for full scans."
+    )
+    @commands.is_owner()
+    async def queryplans(
+        self, ctx: commands.Context[Jovanes], name: Optional[str] = None
+    ) -> None:
+        if name is not None and name not in statements.REGISTRY:
+            await ctx.send(f"No statement is registered as `{name}`.")
+            return
+
+        async with self.bot.pool.acquire() as conn:
+            plans = await statements.explain(conn)
+
+        if name is not None:
+            plan = "\n".join(plans[name]) or "No table is read."
+            await ctx.send(f"```sql\n{statements.REGISTRY[name].sql}``````\n{plan}```")
+            return
+
+        scans = statements.full_scans(plans)
+
+        e = discord.Embed(
+            title="Query Plans",
+            description=f"Checked {len(plans)} statement(s), {len(scans)} full scan(s).",
+            color=discord.Color.red() if scans else discord.Color.green(),
+            timestamp=discord.utils.utcnow(),
+        )
+        for statement, detail in scans[:25]:
+            e.add_field(name=statement, value=f"`{detail}`", inline=False)
+        await ctx.send(embed=e)
+
+    @commands.command(description="Shows the usage of the local attachment cache.")
+    @commands.is_owner()
+    async def imagestats(self, ctx: commands.Context[Jovanes]) -> None:
+        cache = self.bot.attachment_cache
+
+        e = discord.Embed(
+            title="Attachment Cache",
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+        e.add_field(
+            name="Usage",
+            value=f"Files: {len(cache)}\nIndexed Messages: {len(cache.index)}\nSize: {cache.total_bytes / MB:.2f}/{cache.max_bytes / MB:.2f} MB",
+        )
+        e.add_field(
+            name="Totals",
+            value=f"Stored: {cache.stored}\nDeduplicated: {cache.deduplicated}\nRejected: {cache.rejected}\nEvicted: {cache.evicted}",
+        )
+        e.add_field(
+            name="Downloaded",
+            value="\n".join(
+                f"{mode.title()}: {size / MB:.2f} MB"
+                for mode, size in cache.bytes_downloaded.items()
+            )
+            + f"\nPending (Lazy): {len(cache.pending)}",
+        )
+        await ctx.send(embed=e)
+
+    @commands.command(description="Shows the state of the background delivery queues.")
+    @commands.is_owner()
+    async def queuestats(self, ctx: commands.Context[Jovanes]) -> None:
+        log_queue = self.bot.log_queue
+        attachments = self.bot.attachment_cache
+        results = self.bot.results
+
+        e = discord.Embed(
+            title="Queue Stats",
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+        e.add_field(
+            name="Logging",
+            value=f"Depth: {log_queue.depth}\nGuilds: {len(log_queue.queues)}\nExecutions: {log_queue.executions}\nDelivered: {log_queue.delivered}\nDropped: {log_queue.dropped}",
+        )
+        e.add_field(
+            name="Attachment Downloads",
+            value=f"Depth: {attachments.queue.qsize()}/{attachments.queue.maxsize}\nWorkers: {len(attachments.workers)}\nDropped: {attachments.dropped}\nFailed: {attachments.failed}",
+        )
+        e.add_field(
+            name="Game Results",
+            value=f"Pending: {results.size}/{results.max_size}\nFlushes: {results.flushes}\nWritten: {results.written}\nFailed Flushes: {results.failed}\nDropped: {results.dropped}",
+        )
+        await ctx.send(embed=e)
+
+    @commands.command(description="Shows the state of the prefetched trivia pool.")
+    @commands.is_owner()
+    async def triviastats(self, ctx: commands.Context[Jovanes]) -> None:
+        pool = self.bot.trivia_pool
+
+        e = discord.Embed(
+            title="Trivia Pool",
+            description="\n".join(
+                f"`{_type}` ({difficulty or 'any'}): {len(bucket)}"
+                for (_type, difficulty), bucket in pool.buckets.items()
+            ),
+            color=discord.Color.blue(),
+            timestamp=discord.utils.utcnow(),
+        )
+        e.add_field(
+            name="Totals",
+            value=f"Pooled: {len(pool)}\nFetched: {pool.fetched}\nServed: {pool.served}\nServed After Waiting: {pool.waited}\nRefilling: {len(pool.refills)}",
+        )
+        e.add_field(
+            name="Local Bank",
+            value=f"Served: {self.bot.trivia_bank.served}\nExhausted: {self.bot.trivia_bank.exhausted}",
+        )
+        e.add_field(name="Source", value=pool.fixture_path or "opentdb")
+        await ctx.send(embed=e)
+
+    @commands.command(
+        description="Bulk loads trivia questions into the local bank from an attached opentdb JSON dump."
+    )
+    @commands.is_owner()
+    async def triviaimport(self, ctx: commands.Context[Jovanes]) -> None:
+        if not ctx.message.attachments:
+            await ctx.reply("Attach a JSON dump of the questions.")
+            return
+
+        try:
+            data = json.loads(await ctx.message.attachments[0].read())
+            questions = data["results"] if isinstance(data, dict) else data
+            inserted = await self.bot.trivia_bank.add(questions)
+        except (ValueError, KeyError, TypeError):
+            await ctx.reply("The attached file is not a valid question dump.")
+            return
+
+        await ctx.reply(
+            f"Imported **{inserted}** new question(s), {len(questions) - inserted} were already in the bank."
+        )
+
 
 async def setup(bot: Jovanes) -> None:
     await bot.add_cog(Owner(bot))
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import discord
+import aiohttp
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("discord")
+
+MB = 1024 * 1024
+
+CAPTURE_MODES = ("eager", "lazy")
+CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+class PendingAttachment:
+    # Metadata recorded at message time, lazy mode only fetches the bytes on deletion
+    __slots__ = ("url", "proxy_url", "filename", "content_type", "size")
+
+    def __init__(self, attachment: discord.Attachment) -> None:
+        self.url = attachment.url
+        self.proxy_url = attachment.proxy_url
+        self.filename = attachment.filename
+        self.content_type = attachment.content_type
+        self.size = attachment.size
+
+
+class CachedAttachment:
+    __slots__ = (
+        "digest",
+        "path",
+        "filename",
+        "content_type",
+        "size",
+        "stored_at",
+        "message_ids",
+    )
+
+    def __init__(
+        self,
+        digest: str,
+        path: str,
+        filename: str,
+        content_type: Optional[str],
+        size: int,
+    ) -> None:
+        self.digest = digest
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.stored_at = time.monotonic()
+        self.message_ids: Set[int] = set()
+
+    @property
+    def extension(self) -> str:
+        return self.filename.split(".")[::-1][0].lower()
+
+
+class AttachmentCache:
+    def __init__(
+        self,
+        directory: str = "./images",
+        *,
+        max_bytes: int = 512 * MB,
+        max_file_size: int = 25 * MB,
+        max_age: float = 86400.0,
+        max_pending: int = 10000,
+        grace: float = 10.0,
+        timeout: float = 60.0,
+        workers: int = 4,
+        concurrency: int = 4,
+        max_queue: int = 100,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.grace = grace
+        self.timeout = timeout
+        self.worker_count = workers
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.queue: asyncio.Queue[Tuple[int, PendingAttachment]] = asyncio.Queue(
+            maxsize=max_queue
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.workers: List[asyncio.Task] = []
+
+        # Content hash -> file, least recently used first
+        self.files: OrderedDict[str, CachedAttachment] = OrderedDict()
+        # Message ID -> content hash
+        self.index: Dict[int, str] = {}
+        self.total_bytes = 0
+        # Content hash -> lock and number of downloads using it, identical files are stored one at a time
+        self.storing: Dict[str, asyncio.Lock] = {}
+        self.storing_users: Dict[str, int] = {}
+        # Message ID -> metadata of attachments captured lazily
+        self.pending: OrderedDict[int, PendingAttachment] = OrderedDict()
+
+        self.bytes_downloaded: Dict[str, int] = {mode: 0 for mode in CAPTURE_MODES}
+        self.stored = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def setup(self, session: aiohttp.ClientSession) -> None:
+        # The index only lives in memory, files left over from a previous run can't be looked up anymore
+        self.clear()
+
+        self.session = session
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.worker_count)
+        ]
+
+    async def close(self) -> None:
+        for worker in self.workers:
+            worker.cancel()
+
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers.clear()
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def get(self, message_id: int) -> Optional[CachedAttachment]:
+        digest = self.index.get(message_id)
+        if digest is None:
+            return None
+
+        cached = self.files.get(digest)
+        if cached is None:
+            # The file was evicted without this message being unindexed
+            del self.index[message_id]
+            return None
+
+        self.files.move_to_end(digest)
+        return cached
+
+    def capture(self, message_id: int, attachment: discord.Attachment) -> bool:
+        if attachment.size > self.max_file_size:
+            self.rejected += 1
+            return False
+
+        # Message handling never waits on downloads, a full queue drops the capture instead
+        try:
+            self.queue.put_nowait((message_id, PendingAttachment(attachment)))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+        return True
+
+    def remember(self, message_id: int, attachment: discord.Attachment) -> bool:
+        if attachment.size > self.max_file_size:
+            self.rejected += 1
+            return False
+
+        self.pending[message_id] = PendingAttachment(attachment)
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+
+        return True
+
+    async def fetch_pending(self, message_id: int) -> bool:
+        pending = self.pending.pop(message_id, None)
+        if not pending:
+            return False
+
+        # The proxy URL keeps serving the file for a short while after the message is gone
+        return await self._download(
+            message_id, pending, pending.proxy_url, "lazy", self.grace
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            message_id, pending = await self.queue.get()
+            try:
+                await self._download(
+                    message_id, pending, pending.url, "eager", self.timeout
+                )
+            except Exception:
+                logger.exception(f"Unable to capture attachment of {message_id}.")
+            finally:
+                self.queue.task_done()
+
+    async def _download(
+        self,
+        message_id: int,
+        pending: PendingAttachment,
+        url: str,
+        mode: str,
+        timeout: float,
+    ) -> bool:
+        if not self.session:
+            return False
+
+        temp_path = os.path.join(self.directory, f"{message_id}.part")
+        hasher = hashlib.sha256()
+        size = 0
+
+        async with self.semaphore:
+            fp: BinaryIO = await asyncio.to_thread(open, temp_path, "wb")
+            completed = False
+            try:
+                async with self.session.get(
+                    url, timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as resp:
+                    if resp.status != 200:
+                        raise aiohttp.ClientResponseError(
+                            resp.request_info, resp.history, status=resp.status
+                        )
+
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_file_size:
+                            raise FileTooLarge()
+
+                        hasher.update(chunk)
+                        await asyncio.to_thread(fp.write, chunk)
+
+                await asyncio.to_thread(fp.close)
+                completed = True
+            except (aiohttp.ClientError, asyncio.TimeoutError, FileTooLarge):
+                return False
+            finally:
+                if not completed:
+                    # Any failure, including a write error or the worker being cancelled, drops the
+                    # partial file. Done synchronously so a second cancellation can't interrupt it
+                    self._discard(fp, temp_path)
+                    self.failed += 1
+
+        self.bytes_downloaded[mode] += size
+        await self._add(
+            message_id,
+            temp_path,
+            hasher.hexdigest(),
+            size,
+            pending.filename,
+            pending.content_type,
+        )
+        return True
+
+    def _discard(self, fp: BinaryIO, temp_path: str) -> None:
+        try:
+            fp.close()
+        except OSError:
+            pass
+
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    async def _add(
+        self,
+        message_id: int,
+        temp_path: str,
+        digest: str,
+        size: int,
+        filename: str,
+        content_type: Optional[str],
+    ) -> None:
+        lock = self.storing.get(digest)
+        if lock is None:
+            lock = self.storing[digest] = asyncio.Lock()
+        self.storing_users[digest] = self.storing_users.get(digest, 0) + 1
+
+        duplicate = False
+        try:
+            async with lock:
+                # Checked under the lock, an identical download may have been stored while this one waited
+                cached = self.files.get(digest)
+                if cached:
+                    duplicate = True
+                    self.files.move_to_end(digest)
+                    self.deduplicated += 1
+                else:
+                    cached = CachedAttachment(digest, "", filename, content_type, size)
+                    cached.path = os.path.join(
+                        self.directory, f"{digest}.{cached.extension}"
+                    )
+                    await asyncio.to_thread(os.replace, temp_path, cached.path)
+
+                    self.files[digest] = cached
+                    self.total_bytes += cached.size
+                    self.stored += 1
+
+                cached.message_ids.add(message_id)
+                self.index[message_id] = digest
+        finally:
+            self.storing_users[digest] -= 1
+            if not self.storing_users[digest]:
+                del self.storing_users[digest]
+                del self.storing[digest]
+
+        self.prune()
+
+        if duplicate:
+            await asyncio.to_thread(os.remove, temp_path)
+
+    def _remove(self, cached: CachedAttachment) -> None:
+        del self.files[cached.digest]
+        self.total_bytes -= cached.size
+        self.evicted += 1
+
+        for message_id in cached.message_ids:
+            self.index.pop(message_id, None)
+
+        try:
+            os.remove(cached.path)
+        except FileNotFoundError:
+            pass
+
+    def prune(self) -> None:
+        deadline = time.monotonic() - self.max_age
+        for cached in [c for c in self.files.values() if c.stored_at < deadline]:
+            self._remove(cached)
+
+        while self.total_bytes > self.max_bytes and self.files:
+            self._remove(next(iter(self.files.values())))
+
+    def clear(self) -> None:
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+        os.mkdir(self.directory)
+
+        self.files.clear()
+        self.index.clear()
+        self.pending.clear()
+        self.total_bytes = 0
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    def __init__(self, *, maxsize: int = 1024, ttl: float = 600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # Least recently used first, values are stored with their expiry time
+        self.data: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        self.inflight: Dict[K, asyncio.Future[V]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses + self.coalesced
+        return ((self.hits + self.coalesced) / total * 100) if total else 0.0
+
+    def get(self, key: K) -> Optional[V]:
+        try:
+            expires, value = self.data[key]
+        except KeyError:
+            return None
+
+        if expires < time.monotonic():
+            del self.data[key]
+            return None
+
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self.data[key] = (time.monotonic() + self.ttl, value)
+        self.data.move_to_end(key)
+
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self.data.pop(key, None)
+
+    def clear(self) -> None:
+        self.data.clear()
+
+    async def get_or_fetch(
+        self,
+        key: K,
+        factory: Callable[[], Awaitable[V]],
+        *,
+        cache_if: Optional[Callable[[V], bool]] = None,
+    ) -> V:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # Concurrent callers asking for the same key share a single upstream call
+        if key in self.inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self.inflight[key])
+
+        self.misses += 1
+
+        # The fetch runs in its own task, a caller that gets cancelled doesn't cancel everyone sharing it
+        task = asyncio.create_task(self._fetch(key, factory, cache_if))
+        task.add_done_callback(_retrieve)
+        self.inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self,
+        key: K,
+        factory: Callable[[], Awaitable[V]],
+        cache_if: Optional[Callable[[V], bool]],
+    ) -> V:
+        try:
+            value = await factory()
+        finally:
+            del self.inflight[key]
+
+        if cache_if is None or cache_if(value):
+            self.set(key, value)
+
+        return value
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    # Marks the exception as retrieved when every caller was cancelled before the fetch finished
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import asqlite
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+
+from helpers import statements
+from helpers.attachments import MB
+from helpers.instrumentation import QueryStats
+from types import TracebackType
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    from asqlite import ProxiedConnection, Transaction
+    from ..main import Jovanes
+
+logger = logging.getLogger("discord")
+
+T = TypeVar("T")
+
+
+class ConnectionProfile:
+    __slots__ = (
+        "journal_mode",
+        "synchronous",
+        "mmap_size",
+        "cache_size",
+        "temp_store",
+        "busy_timeout",
+    )
+
+    def __init__(
+        self,
+        *,
+        journal_mode: str = "wal",
+        synchronous: str = "normal",
+        mmap_size: int = 256 * MB,
+        cache_size: int = -64000,  # Negative values are KiB, so roughly 64 MB per connection
+        temp_store: str = "memory",
+        busy_timeout: int = 5000,
+    ) -> None:
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.temp_store = temp_store
+        self.busy_timeout = busy_timeout
+
+    @classmethod
+    def from_env(cls) -> ConnectionProfile:
+        defaults = cls()
+        return cls(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", defaults.journal_mode),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", defaults.synchronous),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", str(defaults.mmap_size))),
+            cache_size=int(os.getenv("SQLITE_CACHE_SIZE", str(defaults.cache_size))),
+            temp_store=os.getenv("SQLITE_TEMP_STORE", defaults.temp_store),
+            busy_timeout=int(
+                os.getenv("SQLITE_BUSY_TIMEOUT", str(defaults.busy_timeout))
+            ),
+        )
+
+    def pragmas(self) -> List[str]:
+        # synchronous=NORMAL is only safe against corruption in WAL mode, so the journal mode goes first
+        return [
+            f"PRAGMA journal_mode = {self.journal_mode}",
+            f"PRAGMA synchronous = {self.synchronous}",
+            f"PRAGMA mmap_size = {self.mmap_size}",
+            f"PRAGMA cache_size = {self.cache_size}",
+            f"PRAGMA temp_store = {self.temp_store}",
+            f"PRAGMA busy_timeout = {self.busy_timeout}",
+        ]
+
+    def reader_pragmas(self) -> List[str]:
+        # The journal mode and sync level belong to the writer, readers only tune their own caches
+        return [
+            f"PRAGMA mmap_size = {self.mmap_size}",
+            f"PRAGMA cache_size = {self.cache_size}",
+            f"PRAGMA temp_store = {self.temp_store}",
+            f"PRAGMA busy_timeout = {self.busy_timeout}",
+            "PRAGMA query_only = ON",
+        ]
+
+    def apply(self, conn: sqlite3.Connection) -> None:
+        for pragma in self.pragmas():
+            conn.execute(pragma)
+
+    def apply_reader(self, conn: sqlite3.Connection) -> None:
+        for pragma in self.reader_pragmas():
+            conn.execute(pragma)
+
+
+READ_STATEMENTS = ("SELECT", "WITH", "EXPLAIN")
+
+
+def is_read(sql: str) -> bool:
+    words = sql.split(None, 1)
+    return bool(words) and words[0].upper() in READ_STATEMENTS
+
+
+class Database:
+    def __init__(
+        self,
+        path: str,
+        *,
+        profile: ConnectionProfile,
+        readers: int = 4,
+        stats: Optional[QueryStats] = None,
+    ) -> None:
+        self.path = path
+        self.profile = profile
+        self.size = readers
+        self.stats = stats or QueryStats()
+
+        # A pool of one: its connection queue doubles as the write queue
+        self.writer: asqlite.Pool
+        self.readers: asqlite.Pool
+
+        self.reads = 0
+        self.writes = 0
+
+    async def start(self) -> None:
+        # Sized so no registered statement is ever evicted from a connection's prepared statement cache
+        cached = statements.cache_size()
+
+        # The writer goes first, it creates the file and switches it to WAL before any reader opens it
+        self.writer = await asqlite.create_pool(
+            self.path, size=1, init=self.profile.apply, cached_statements=cached
+        )
+        self.readers = await asqlite.create_pool(
+            f"file:{os.path.abspath(self.path)}?mode=ro",
+            size=self.size,
+            init=self.profile.apply_reader,
+            uri=True,
+            cached_statements=cached,
+        )
+
+    async def __aenter__(self) -> Database:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    def acquire(self) -> RoutedConnection:
+        return RoutedConnection(self)
+
+    async def close(self) -> None:
+        await self.readers.close()
+        await self.writer.close()
+
+
+def _affected_rows(cursor: Any) -> int:
+    return cursor.get_cursor().rowcount
+
+
+class RoutedConnection:
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self.reader: Optional[ProxiedConnection] = None
+        self.writer: Optional[ProxiedConnection] = None
+
+    async def __aenter__(self) -> RoutedConnection:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        reader, self.reader = self.reader, None
+        writer, self.writer = self.writer, None
+
+        # The writer pool holds a single connection, losing it would hang every later write,
+        # so it is released even if the reader release or the rollback fails or is cancelled
+        try:
+            if reader is not None:
+                await self.db.readers.release(reader)
+        finally:
+            if writer is not None:
+                try:
+                    # Never hand the writer to the next caller in the middle of a transaction
+                    if writer.get_connection().in_transaction:
+                        await writer.rollback()
+                finally:
+                    await self.db.writer.release(writer)
+
+    async def _read_connection(self) -> ProxiedConnection:
+        # Once a block has written, it keeps reading from the writer so it sees its own changes
+        if self.writer is not None:
+            return self.writer
+
+        if self.reader is None:
+            started = time.perf_counter()
+            self.reader = await self.db.readers.acquire()
+            self.db.stats.record_acquire("reader", time.perf_counter() - started)
+
+        self.db.reads += 1
+        return self.reader
+
+    async def _write_connection(self) -> ProxiedConnection:
+        if self.writer is None:
+            started = time.perf_counter()
+            self.writer = await self.db.writer.acquire()
+            self.db.stats.record_acquire("writer", time.perf_counter() - started)
+
+        self.db.writes += 1
+        return self.writer
+
+    async def _connection_for(self, sql: str) -> ProxiedConnection:
+        if is_read(sql):
+            return await self._read_connection()
+
+        return await self._write_connection()
+
+    async def _timed(
+        self, sql: str, query: Awaitable[T], rows: Callable[[T], int]
+    ) -> T:
+        # Only the query itself is timed, waiting for the connection is recorded separately
+        started = time.perf_counter()
+        try:
+            result = await query
+        except Exception as exc:
+            self.db.stats.record(sql, time.perf_counter() - started, error=exc)
+            raise
+
+        self.db.stats.record(sql, time.perf_counter() - started, rows=rows(result))
+        return result
+
+    async def fetchone(self, sql: str, *parameters: Any) -> Optional[sqlite3.Row]:
+        conn = await self._connection_for(sql)
+        return await self._timed(
+            sql, conn.fetchone(sql, *parameters), lambda row: int(row is not None)
+        )
+
+    async def fetchall(self, sql: str, *parameters: Any) -> List[sqlite3.Row]:
+        conn = await self._connection_for(sql)
+        return await self._timed(sql, conn.fetchall(sql, *parameters), len)
+
+    async def execute(self, sql: str, *parameters: Any) -> Any:
+        conn = await self._write_connection()
+        return await self._timed(sql, conn.execute(sql, *parameters), _affected_rows)
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable[Any]]) -> Any:
+        conn = await self._write_connection()
+        return await self._timed(sql, conn.executemany(sql, parameters), _affected_rows)
+
+    async def executescript(self, sql: str) -> Any:
+        conn = await self._write_connection()
+        return await self._timed(sql, conn.executescript(sql), lambda cursor: 0)
+
+    def transaction(self) -> RoutedTransaction:
+        return RoutedTransaction(self)
+
+    def get_connection(self) -> sqlite3.Connection:
+        # Only meaningful for the writer, callers use it for in_transaction and total_changes
+        assert self.writer is not None
+        return self.writer.get_connection()
+
+
+class RoutedTransaction:
+    def __init__(self, conn: RoutedConnection) -> None:
+        self.conn = conn
+        self.transaction: Optional[Transaction] = None
+
+    async def __aenter__(self) -> RoutedTransaction:
+        writer = await self.conn._write_connection()
+        self.transaction = writer.transaction()
+        await self.transaction.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        assert self.transaction is not None
+        await self.conn._timed(
+            "ROLLBACK" if exc_type else "COMMIT",
+            self.transaction.__aexit__(exc_type, exc_value, traceback),
+            lambda result: 0,
+        )
+
+
+class DatabaseMaintenance:
+    def __init__(
+        self,
+        bot: Jovanes,
+        *,
+        checkpoint_interval: float = 300.0,
+        optimize_interval: float = 3600.0,
+    ) -> None:
+        self.bot = bot
+        self.checkpoint_interval = checkpoint_interval
+        self.optimize_interval = optimize_interval
+        self.task: Optional[asyncio.Task] = None
+
+        # (busy, frames in the WAL, frames checkpointed) as reported by the last checkpoint
+        self.last_checkpoint: Optional[Tuple[int, int, int]] = None
+        self.checkpoints = 0
+        self.optimizations = 0
+        self.last_optimize = time.monotonic()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+
+            try:
+                await self.checkpoint()
+                if time.monotonic() - self.last_optimize >= self.optimize_interval:
+                    await self.optimize()
+            except sqlite3.Error as exc:
+                logger.warning(f"Database maintenance failed: {exc}")
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> Tuple[int, int, int]:
+        # PASSIVE never waits on readers or writers, anything it can't copy back is left for the next run
+        async with self.bot.pool.acquire() as conn:
+            res = await conn.fetchone(f"PRAGMA wal_checkpoint({mode})")
+
+        self.last_checkpoint = (res[0], res[1], res[2])
+        self.checkpoints += 1
+        return self.last_checkpoint
+
+    async def optimize(self) -> None:
+        async with self.bot.pool.acquire() as conn:
+            await conn.execute("PRAGMA optimize")
+
+        self.last_optimize = time.monotonic()
+        self.optimizations += 1
+
+    async def close(self) -> None:
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+        try:
+            await self.optimize()
+            await self.checkpoint("TRUNCATE")
+        except sqlite3.Error as exc:
+            logger.warning(f"Final database maintenance failed: {exc}")
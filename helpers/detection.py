@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+
+from concurrent.futures import ThreadPoolExecutor
+from langdetect import DetectorFactory, detect, detector_factory
+from langdetect.lang_detect_exception import LangDetectException
+from helpers.cache import TTLCache
+from typing import Optional
+
+
+def _load_profiles() -> None:
+    DetectorFactory.seed = (
+        0  # Detection samples randomly, a fixed seed keeps results stable
+    )
+    detector_factory.init_factory()
+
+
+def _detect(text: str) -> Optional[str]:
+    try:
+        return detect(text)
+    except LangDetectException:
+        return None
+
+
+class LanguageDetector:
+    def __init__(
+        self,
+        *,
+        workers: int = 2,
+        timeout: float = 2.0,
+        maxsize: int = 4096,
+        ttl: float = 3600.0,
+    ) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self.cache: TTLCache[str, str] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.timeouts = 0
+
+    async def start(self) -> None:
+        # Threads rather than processes: spawned workers would re-import main.py, which starts the bot
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="langdetect"
+        )
+
+        # Profiles are loaded once up front instead of on the first detection
+        await asyncio.get_running_loop().run_in_executor(self.executor, _load_profiles)
+
+    def close(self) -> None:
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def detect(self, text: str) -> Optional[str]:
+        if not text or not self.executor:
+            return None
+
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return await self.cache.get_or_fetch(
+            key, lambda: self._run(text), cache_if=lambda lang: lang is not None
+        )
+
+    async def _run(self, text: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self.executor, _detect, text), self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
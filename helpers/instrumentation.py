@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import re
+import time
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger("discord")
+
+# Upper bounds of the latency buckets in milliseconds, the last bucket catches everything slower
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(sql: str) -> str:
+    # Literals and placeholder lists of any length collapse, so the same query always has one shape
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(?, ...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def average(self) -> float:
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, ms)] += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, percent: float) -> float:
+        # Reported as the upper bound of the bucket the percentile falls in, capped by the slowest sample
+        target = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max)
+
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in BUCKETS] + [f">{BUCKETS[-1]}"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "average_ms": round(self.average, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class QueryShape:
+    __slots__ = ("sql", "latency", "rows", "errors")
+
+    def __init__(self, sql: str) -> None:
+        self.sql = sql
+        self.latency = Histogram()
+        self.rows = 0
+        self.errors = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "rows": self.rows,
+            "errors": self.errors,
+            **self.latency.to_dict(),
+        }
+
+
+class QueryStats:
+    def __init__(
+        self, *, slow_threshold: float = 100.0, slow_log_size: int = 100
+    ) -> None:
+        self.slow_threshold = slow_threshold
+        self.started = time.time()
+
+        self.shapes: Dict[str, QueryShape] = {}
+        # Raw statements are cached by their exact text, the normalization only runs once per string
+        self.normalized: Dict[str, str] = {}
+
+        # Time spent waiting for a connection, per pool
+        self.acquires: Dict[str, Histogram] = {
+            "reader": Histogram(),
+            "writer": Histogram(),
+        }
+        self.slow: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+
+    def shape(self, sql: str) -> QueryShape:
+        key = self.normalized.get(sql)
+        if key is None:
+            # Statements built with inline literals would otherwise grow this without bound
+            if len(self.normalized) >= 4096:
+                self.normalized.clear()
+
+            key = self.normalized[sql] = normalize(sql)
+
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self.shapes[key] = QueryShape(key)
+
+        return shape
+
+    def record(
+        self,
+        sql: str,
+        seconds: float,
+        *,
+        rows: int = 0,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        shape = self.shape(sql)
+        ms = seconds * 1000
+
+        shape.latency.add(ms)
+        shape.rows += max(rows, 0)
+        if error is not None:
+            shape.errors += 1
+
+        if ms >= self.slow_threshold:
+            logger.warning(f"Slow query ({ms:.1f}ms): {shape.sql}")
+            self.slow.append(
+                {"at": time.time(), "ms": round(ms, 3), "rows": rows, "sql": shape.sql}
+            )
+
+    def record_acquire(self, pool: str, seconds: float) -> None:
+        self.acquires[pool].add(seconds * 1000)
+
+    def top(self, count: int = 10, *, key: str = "total") -> List[QueryShape]:
+        match key:
+            case "average":
+                sort = lambda shape: shape.latency.average
+            case "max":
+                sort = lambda shape: shape.latency.max
+            case "calls":
+                sort = lambda shape: shape.latency.count
+            case "rows":
+                sort = lambda shape: shape.rows
+            case _:
+                sort = lambda shape: shape.latency.total
+
+        return sorted(self.shapes.values(), key=sort, reverse=True)[:count]
+
+    def reset(self) -> None:
+        self.started = time.time()
+        self.shapes.clear()
+        self.normalized.clear()
+        self.acquires = {pool: Histogram() for pool in self.acquires}
+        self.slow.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "dumped": time.time(),
+            "slow_threshold_ms": self.slow_threshold,
+            "acquires": {
+                pool: histogram.to_dict() for pool, histogram in self.acquires.items()
+            },
+            "queries": [shape.to_dict() for shape in self.top(len(self.shapes))],
+            "slow": list(self.slow),
+        }
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import sqlite3
+
+from helpers import statements
+from helpers.cache import TTLCache
+from typing import Any, Callable, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..main import Jovanes
+
+PAGE_SIZE = 10
+
+
+def rank_emoji(position: int) -> str:
+    match position:
+        case 1:
+            return "\U0001f947"
+        case 2:
+            return "\U0001f948"
+        case 3:
+            return "\U0001f949"
+        case _:
+            return "*"
+
+
+class Leaderboard:
+    def __init__(
+        self,
+        *,
+        name: str,
+        title: str,
+        table: str,
+        score: str,
+        columns: str,
+        formatter: Callable[[sqlite3.Row], str],
+        descending: bool = True,
+        where: str = "1",
+        empty: str = "No one is on this leaderboard yet.",
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.title = title
+        self.formatter = formatter
+        self.empty = empty
+
+        # Boards that are expensive to rank and fine to show slightly stale keep their results for a while
+        self.cache: Optional[TTLCache[Tuple[Any, ...], List[sqlite3.Row]]] = (
+            TTLCache(maxsize=256, ttl=ttl) if ttl else None
+        )
+
+        # Ties on the score are broken by user_id so every row has a unique, indexable position
+        order = "DESC" if descending else "ASC"
+        reverse = "ASC" if descending else "DESC"
+        after = "<" if descending else ">"
+        ahead = ">" if descending else "<"
+
+        # Every query is scoped to one guild, guild 0 holding the global rows. The keyset bound goes
+        # before the filter, otherwise the planner picks the filter's (much wider) range on the index
+        columns = f"user_id, {score} AS score, {columns}"
+        ordering = f"ORDER BY {score} {order}, user_id {order}"
+        reversed_ordering = f"ORDER BY {score} {reverse}, user_id {reverse}"
+
+        prefix = f"leaderboard.{name}"
+        self.offset_query = statements.register(
+            f"{prefix}.offset",
+            f"SELECT {columns} FROM {table} WHERE guild_id = ? AND ({where}) {ordering} LIMIT ? OFFSET ?",
+        )
+        self.keyset_query = statements.register(
+            f"{prefix}.keyset",
+            f"SELECT {columns} FROM {table} WHERE guild_id = ? AND ({score}, user_id) {after} (?, ?) AND ({where}) {ordering} LIMIT ?",
+        )
+        # The same bound walked the other way, closest row first, for the rows ahead of a known one
+        self.reverse_keyset_query = statements.register(
+            f"{prefix}.reverse_keyset",
+            f"SELECT {columns} FROM {table} WHERE guild_id = ? AND ({score}, user_id) {ahead} (?, ?) AND ({where}) {reversed_ordering} LIMIT ?",
+        )
+        self.count_query = statements.register(
+            f"{prefix}.count",
+            f"SELECT COUNT(*) FROM {table} WHERE guild_id = ? AND ({where})",
+        )
+        self.row_query = statements.register(
+            f"{prefix}.row",
+            f"SELECT {columns} FROM {table} WHERE guild_id = ? AND user_id = ? AND ({where})",
+        )
+        self.rank_query = statements.register(
+            f"{prefix}.rank",
+            f"SELECT COUNT(*) FROM {table} WHERE guild_id = ? AND ({score}, user_id) {ahead} (?, ?) AND ({where})",
+        )
+
+    def format(self, position: int, row: sqlite3.Row) -> str:
+        return f"{rank_emoji(position)} <@{row['user_id']}> ({self.formatter(row)})"
+
+    async def _fetch(
+        self, bot: Jovanes, query: str, params: Tuple[Any, ...]
+    ) -> List[sqlite3.Row]:
+        async def fetch() -> List[sqlite3.Row]:
+            async with bot.pool.acquire() as conn:
+                return await conn.fetchall(query, params)
+
+        if self.cache is None:
+            return await fetch()
+
+        return await self.cache.get_or_fetch((query, *params), fetch)
+
+    async def count(self, bot: Jovanes, guild_id: int) -> int:
+        res = await self._fetch(bot, self.count_query, (guild_id,))
+        return res[0][0]
+
+    async def fetch_at(
+        self, bot: Jovanes, guild_id: int, offset: int, limit: int
+    ) -> List[sqlite3.Row]:
+        return await self._fetch(bot, self.offset_query, (guild_id, limit, offset))
+
+    async def fetch_after(
+        self, bot: Jovanes, guild_id: int, row: sqlite3.Row, limit: int
+    ) -> List[sqlite3.Row]:
+        return await self._fetch(
+            bot, self.keyset_query, (guild_id, row["score"], row["user_id"], limit)
+        )
+
+    async def fetch_before(
+        self, bot: Jovanes, guild_id: int, row: sqlite3.Row, limit: int
+    ) -> List[sqlite3.Row]:
+        rows = await self._fetch(
+            bot,
+            self.reverse_keyset_query,
+            (guild_id, row["score"], row["user_id"], limit),
+        )
+        return rows[::-1]
+
+    async def fetch_row(
+        self, bot: Jovanes, guild_id: int, user_id: int
+    ) -> Optional[sqlite3.Row]:
+        res = await self._fetch(bot, self.row_query, (guild_id, user_id))
+        return res[0] if res else None
+
+    async def rank_of(self, bot: Jovanes, guild_id: int, row: sqlite3.Row) -> int:
+        ahead = await self._fetch(
+            bot, self.rank_query, (guild_id, row["score"], row["user_id"])
+        )
+        return ahead[0][0]
+
+
+TRIVIA = Leaderboard(
+    name="trivia",
+    title="Trivia Leaderboard",
+    table="trivia",
+    score="correct",
+    columns="correct, wrong, streak",
+    formatter=lambda row: f"Correct: {row['correct']}, Wrong: {row['wrong']}, Streak: {row['streak']}",
+    empty="No one answered any questions.",
+)
+
+# The filters match the partial indexes on trivia.accuracy word for word, otherwise they are not used
+TRIVIA_ACCURACY = Leaderboard(
+    name="trivia_accuracy",
+    title="Trivia Leaderboard",
+    table="trivia",
+    score="accuracy",
+    columns="correct, wrong",
+    formatter=lambda row: f"Percentage: **{row['score'] * 100:.2f}%**",
+    where="answered > 50",
+    empty="No one answered more than 50 questions.",
+    ttl=60.0,
+)
+
+TRIVIA_UNRANKED = Leaderboard(
+    name="trivia_unranked",
+    title="Trivia Leaderboard",
+    table="trivia",
+    score="accuracy",
+    columns="correct, wrong",
+    formatter=lambda row: f"Percentage: **{row['score'] * 100:.2f}%**",
+    where="answered <= 50",
+    ttl=60.0,
+)
+
+MEMORY = Leaderboard(
+    name="memory",
+    title="Memory Leaderboard",
+    table="memory",
+    score="total_seconds",
+    columns="minutes, seconds",
+    formatter=lambda row: f"Time: {row['minutes']} minute(s), {row['seconds']} second(s)",
+    descending=False,
+    empty="No one finished a memory game.",
+)
+
+TICTACTOE = Leaderboard(
+    name="tictactoe",
+    title="Tic-Tac-Toe Leaderboard",
+    table="tictactoe_stats",
+    score="wins",
+    columns="wins, losses",
+    formatter=lambda row: f"Wins: {row['wins']}, Losses: {row['losses']}",
+    where="wins > 0",
+    empty="No one won any matches.",
+)
+
+RPS = Leaderboard(
+    name="rps",
+    title="RPS Leaderboard",
+    table="rps_stats",
+    score="wins",
+    columns="wins, losses",
+    formatter=lambda row: f"Wins: {row['wins']}, Losses: {row['losses']}",
+    where="wins > 0",
+    empty="No one won any matches.",
+)
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from typing import Awaitable, Callable, List, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from asqlite import ProxiedConnection
+
+logger = logging.getLogger("discord")
+
+# Everything up to per-guild leaderboards and the trivia accuracy columns, written to be safe on
+# databases that were created before migrations were versioned
+BASE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS guild_data (
+        guild_id INT NOT NULL,
+        log_channel INT,
+        log_webhook VARCHAR(150),
+        PRIMARY KEY (guild_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS prefixes (
+        guild_id INT NOT NULL,
+        prefix CHAR(16)
+    );
+
+    CREATE TABLE IF NOT EXISTS trivia (
+        guild_id INT NOT NULL DEFAULT 0,
+        user_id INT NOT NULL,
+        correct INT,
+        wrong INT,
+        streak INT,
+        answered INT GENERATED ALWAYS AS (correct + wrong) VIRTUAL,
+        accuracy REAL GENERATED ALWAYS AS (CAST(correct AS REAL) / (correct + wrong)) VIRTUAL,
+        PRIMARY KEY (guild_id, user_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS configuration (
+        guild_id INT NOT NULL,
+        entity CHAR(40),
+        disabled INT
+    );
+
+    CREATE TABLE IF NOT EXISTS memory (
+        guild_id INT NOT NULL DEFAULT 0,
+        user_id INT NOT NULL,
+        minutes INT,
+        seconds INT,
+        total_seconds INT,
+        PRIMARY KEY (guild_id, user_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS tictactoe (
+        winner INT NOT NULL,
+        rival INT NOT NULL,
+        guild_id INT NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS rps (
+        winner INT NOT NULL,
+        rival INT NOT NULL,
+        guild_id INT NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS tictactoe_stats (
+        guild_id INT NOT NULL DEFAULT 0,
+        user_id INT NOT NULL,
+        wins INT NOT NULL DEFAULT 0,
+        losses INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS rps_stats (
+        guild_id INT NOT NULL DEFAULT 0,
+        user_id INT NOT NULL,
+        wins INT NOT NULL DEFAULT 0,
+        losses INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    );
+
+    -- Leaderboards page through (score, user_id) within one guild (0 being global) with keyset pagination
+    CREATE INDEX IF NOT EXISTS trivia_rank ON trivia (guild_id, correct, user_id);
+    CREATE INDEX IF NOT EXISTS trivia_accuracy_rank ON trivia (guild_id, accuracy, user_id) WHERE answered > 50;
+    CREATE INDEX IF NOT EXISTS trivia_unranked_accuracy ON trivia (guild_id, accuracy, user_id) WHERE answered <= 50;
+    CREATE INDEX IF NOT EXISTS memory_rank ON memory (guild_id, total_seconds, user_id);
+    CREATE INDEX IF NOT EXISTS tictactoe_stats_rank ON tictactoe_stats (guild_id, wins, user_id);
+    CREATE INDEX IF NOT EXISTS rps_stats_rank ON rps_stats (guild_id, wins, user_id);
+
+    -- One-off backfill from the match history, a no-op once the counters exist
+    INSERT INTO tictactoe_stats (guild_id, user_id, wins, losses)
+    SELECT scope, user_id, SUM(won), SUM(lost) FROM (
+        SELECT 0 AS scope, winner AS user_id, 1 AS won, 0 AS lost FROM tictactoe
+        UNION ALL
+        SELECT 0, rival, 0, 1 FROM tictactoe
+        UNION ALL
+        SELECT guild_id, winner, 1, 0 FROM tictactoe WHERE guild_id != 0
+        UNION ALL
+        SELECT guild_id, rival, 0, 1 FROM tictactoe WHERE guild_id != 0
+    )
+    WHERE NOT EXISTS (SELECT 1 FROM tictactoe_stats)
+    GROUP BY scope, user_id;
+
+    INSERT INTO rps_stats (guild_id, user_id, wins, losses)
+    SELECT scope, user_id, SUM(won), SUM(lost) FROM (
+        SELECT 0 AS scope, winner AS user_id, 1 AS won, 0 AS lost FROM rps
+        UNION ALL
+        SELECT 0, rival, 0, 1 FROM rps
+        UNION ALL
+        SELECT guild_id, winner, 1, 0 FROM rps WHERE guild_id != 0
+        UNION ALL
+        SELECT guild_id, rival, 0, 1 FROM rps WHERE guild_id != 0
+    )
+    WHERE NOT EXISTS (SELECT 1 FROM rps_stats)
+    GROUP BY scope, user_id;
+
+    -- Every match counts towards the guild it was played in and the global leaderboard
+    CREATE TRIGGER IF NOT EXISTS tictactoe_stats_insert AFTER INSERT ON tictactoe
+    BEGIN
+        INSERT INTO tictactoe_stats (guild_id, user_id, wins)
+        SELECT scope, NEW.winner, 1 FROM (SELECT 0 AS scope UNION SELECT NEW.guild_id) WHERE true
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET wins = wins + 1;
+        INSERT INTO tictactoe_stats (guild_id, user_id, losses)
+        SELECT scope, NEW.rival, 1 FROM (SELECT 0 AS scope UNION SELECT NEW.guild_id) WHERE true
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET losses = losses + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS rps_stats_insert AFTER INSERT ON rps
+    BEGIN
+        INSERT INTO rps_stats (guild_id, user_id, wins)
+        SELECT scope, NEW.winner, 1 FROM (SELECT 0 AS scope UNION SELECT NEW.guild_id) WHERE true
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET wins = wins + 1;
+        INSERT INTO rps_stats (guild_id, user_id, losses)
+        SELECT scope, NEW.rival, 1 FROM (SELECT 0 AS scope UNION SELECT NEW.guild_id) WHERE true
+        ON CONFLICT (guild_id, user_id) DO UPDATE SET losses = losses + 1;
+    END;
+
+    CREATE TABLE IF NOT EXISTS attachment_capture (
+        guild_id INT NOT NULL,
+        mode CHAR(8),
+        PRIMARY KEY (guild_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS trivia_questions (
+        id INTEGER PRIMARY KEY,
+        category VARCHAR(100),
+        difficulty CHAR(6),
+        type CHAR(8),
+        question TEXT NOT NULL UNIQUE,
+        correct_answer TEXT NOT NULL,
+        incorrect_answers TEXT NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS trivia_questions_type ON trivia_questions (type);
+    CREATE INDEX IF NOT EXISTS trivia_questions_type_difficulty ON trivia_questions (type, difficulty);
+    CREATE INDEX IF NOT EXISTS trivia_questions_category ON trivia_questions (category, type, difficulty);
+
+    CREATE TABLE IF NOT EXISTS trivia_seen (
+        user_id INT NOT NULL,
+        question_id INT NOT NULL,
+        PRIMARY KEY (user_id, question_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS guess (
+        guild_id INT NOT NULL DEFAULT 0,
+        user_id INT NOT NULL,
+        wins INT,
+        PRIMARY KEY (guild_id, user_id)
+    );
+"""
+
+UNSCOPED_SCORE_TABLES = {
+    "trivia": "user_id, correct, wrong, streak",
+    "memory": "user_id, minutes, seconds, total_seconds",
+    "guess": "user_id, wins",
+}
+UNSCOPED_MATCH_TABLES = ("tictactoe", "rps")
+UNSCOPED_STATS_TABLES = ("tictactoe_stats", "rps_stats")
+
+GENERATED_COLUMNS = {
+    "trivia": {
+        "answered": "INT GENERATED ALWAYS AS (correct + wrong) VIRTUAL",
+        "accuracy": "REAL GENERATED ALWAYS AS (CAST(correct AS REAL) / (correct + wrong)) VIRTUAL",
+    },
+}
+
+
+class Migration:
+    __slots__ = ("version", "description", "script")
+
+    def __init__(
+        self,
+        version: int,
+        description: str,
+        script: Union[str, Callable[[ProxiedConnection], Awaitable[str]]],
+    ) -> None:
+        self.version = version
+        self.description = description
+        self.script = script  # Either the SQL itself or a coroutine building it from the current schema
+
+    async def build(self, conn: ProxiedConnection) -> str:
+        if isinstance(self.script, str):
+            return self.script
+
+        return await self.script(conn)
+
+
+async def _base_schema(conn: ProxiedConnection) -> str:
+    # Tables from before leaderboards were per guild are moved aside, rebuilt and copied back as global rows
+    legacy = await _unscoped_tables(conn)
+    detach = await _missing_generated_columns(conn, exclude=legacy)
+
+    if legacy:
+        detach.extend(
+            [
+                "DROP TRIGGER IF EXISTS tictactoe_stats_insert;",
+                "DROP TRIGGER IF EXISTS rps_stats_insert;",
+            ]
+        )
+
+    attach = []
+    for table in legacy:
+        if table in UNSCOPED_MATCH_TABLES:
+            detach.append(
+                f"ALTER TABLE {table} ADD COLUMN guild_id INT NOT NULL DEFAULT 0;"
+            )
+        elif table in UNSCOPED_STATS_TABLES:
+            # Rebuilt from the match history by the backfill
+            detach.append(f"DROP TABLE {table};")
+        else:
+            columns = UNSCOPED_SCORE_TABLES[table]
+            detach.append(f"DROP INDEX IF EXISTS {table}_rank;")
+            detach.append(f"ALTER TABLE {table} RENAME TO {table}_unscoped;")
+            attach.append(
+                f"INSERT INTO {table} (guild_id, {columns}) SELECT 0, {columns} FROM {table}_unscoped;"
+            )
+            attach.append(f"DROP TABLE {table}_unscoped;")
+
+    return "\n".join([*detach, BASE_SCHEMA, *attach])
+
+
+async def _unscoped_tables(conn: ProxiedConnection) -> List[str]:
+    tables = []
+    for table in (
+        *UNSCOPED_SCORE_TABLES,
+        *UNSCOPED_MATCH_TABLES,
+        *UNSCOPED_STATS_TABLES,
+    ):
+        columns = await conn.fetchall(f"SELECT name FROM pragma_table_info('{table}')")
+        if columns and "guild_id" not in {row[0] for row in columns}:
+            tables.append(table)
+
+    return tables
+
+
+async def _missing_generated_columns(
+    conn: ProxiedConnection, *, exclude: List[str]
+) -> List[str]:
+    statements = []
+    for table, generated in GENERATED_COLUMNS.items():
+        if table in exclude:
+            continue
+
+        # table_info leaves generated columns out, table_xinfo lists them
+        columns = await conn.fetchall(f"SELECT name FROM pragma_table_xinfo('{table}')")
+        existing = {row[0] for row in columns}
+        if not existing:
+            continue
+
+        for name, definition in generated.items():
+            if name not in existing:
+                statements.append(
+                    f"ALTER TABLE {table} ADD COLUMN {name} {definition};"
+                )
+
+    return statements
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Base schema", _base_schema),
+    Migration(
+        2,
+        "Index prefix, configuration and match lookups",
+        """
+        -- Duplicates were possible before, the oldest row of every pair is kept
+        DELETE FROM prefixes WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM prefixes GROUP BY guild_id, prefix
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS prefixes_guild_prefix ON prefixes (guild_id, prefix);
+
+        DELETE FROM configuration WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM configuration GROUP BY guild_id, entity
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS configuration_guild_entity ON configuration (guild_id, entity);
+
+        CREATE INDEX IF NOT EXISTS tictactoe_winner ON tictactoe (winner);
+        CREATE INDEX IF NOT EXISTS tictactoe_rival ON tictactoe (rival);
+        CREATE INDEX IF NOT EXISTS rps_winner ON rps (winner);
+        CREATE INDEX IF NOT EXISTS rps_rival ON rps (rival);
+        """,
+    ),
+]
+
+
+async def current_version(conn: ProxiedConnection) -> int:
+    await conn.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL, description TEXT, applied_at TEXT NOT NULL)"
+    )
+    res = await conn.fetchone("SELECT MAX(version) FROM schema_version")
+    return res[0] or 0
+
+
+async def migrate(conn: ProxiedConnection) -> int:
+    started = time.perf_counter()
+    version = await current_version(conn)
+    pending = [migration for migration in MIGRATIONS if migration.version > version]
+
+    for migration in pending:
+        applied = time.perf_counter()
+        script = await migration.build(conn)
+        description = migration.description.replace("'", "''")
+
+        # executescript commits whatever is open before running, so the transaction lives inside the script
+        try:
+            await conn.executescript(
+                "\n".join(
+                    [
+                        "BEGIN;",
+                        script,
+                        f"INSERT INTO schema_version (version, description, applied_at) VALUES ({migration.version}, '{description}', datetime('now'));",
+                        "COMMIT;",
+                    ]
+                )
+            )
+        except Exception:
+            if conn.get_connection().in_transaction:
+                await conn.execute("ROLLBACK")
+
+            logger.error(
+                f"Migration {migration.version} ({migration.description}) failed, the database stays at version {version}."
+            )
+            raise
+
+        version = migration.version
+        logger.info(
+            f"Applied migration {version} ({migration.description}) in {(time.perf_counter() - applied) * 1000:.2f}ms."
+        )
+
+    logger.info(
+        f"Database schema at version {version}, {len(pending)} migration(s) applied in {(time.perf_counter() - started) * 1000:.2f}ms."
+    )
+    return version
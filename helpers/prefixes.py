@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import re
+
+from typing import List, Optional
+
+
+class PrefixMatcher:
+    def __init__(self, prefixes: List[str]) -> None:
+        self.prefixes = prefixes
+
+        # Longer prefixes are tried first, so the first alternative that matches is the longest one
+        ordered = sorted(prefixes, key=len, reverse=True)
+        self.pattern: Optional[re.Pattern[str]] = (
+            re.compile("|".join(re.escape(prefix) for prefix in ordered))
+            if ordered
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def match(self, content: str) -> Optional[str]:
+        if not self.pattern:
+            return None
+
+        match = self.pattern.match(content)
+        return match.group() if match else None
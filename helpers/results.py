@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..main import Jovanes
+
+logger = logging.getLogger("discord")
+
+
+class ResultBuffer:
+    def __init__(
+        self,
+        bot: Jovanes,
+        *,
+        interval: float = 5.0,
+        max_size: int = 100,
+        max_attempts: int = 3,
+    ) -> None:
+        self.bot = bot
+        self.interval = interval
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+
+        # Statement -> parameter rows, written with one executemany per statement
+        self.pending: Dict[str, List[Tuple[Any, ...]]] = {}
+        # Statement -> failed flushes in a row
+        self.attempts: Dict[str, int] = {}
+        self.size = 0
+        self.full = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def record(self, statement: str, params: Tuple[Any, ...]) -> None:
+        self.pending.setdefault(statement, []).append(params)
+        self.size += 1
+
+        if self.size >= self.max_size:
+            self.full.set()
+
+        if self.task is None:
+            self.task = asyncio.create_task(self._deliver())
+
+    async def _deliver(self) -> None:
+        try:
+            try:
+                await asyncio.wait_for(self.full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+            await self.flush()
+        finally:
+            self.task = None
+
+        if self.size:
+            # Results recorded while flushing (or put back by a failed flush) get their own window
+            self.task = asyncio.create_task(self._deliver())
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if not self.pending:
+                return
+
+            pending = self.pending
+            self.pending, self.size = {}, 0
+            self.full.clear()
+
+            # Every statement gets its own transaction, so one failing statement can't hold back the others
+            for statement, rows in pending.items():
+                try:
+                    async with self.bot.pool.acquire() as conn:
+                        async with conn.transaction():
+                            await conn.executemany(statement, rows)
+                except sqlite3.Error as exc:
+                    self.failed += 1
+                    attempts = self.attempts[statement] = (
+                        self.attempts.get(statement, 0) + 1
+                    )
+
+                    if attempts < self.max_attempts:
+                        logger.warning(
+                            f"Unable to flush {len(rows)} game result(s), attempt {attempts}/{self.max_attempts}: {exc}"
+                        )
+                        self.pending.setdefault(statement, [])[:0] = rows
+                        self.size += len(rows)
+                        continue
+
+                    del self.attempts[statement]
+                    await self._write_each(statement, rows)
+                    continue
+
+                self.attempts.pop(statement, None)
+                self.written += len(rows)
+
+            self.flushes += 1
+
+    async def _write_each(self, statement: str, rows: List[Tuple[Any, ...]]) -> None:
+        # Out of retries: the rows are written one by one and only the ones that still fail are dropped
+        for params in rows:
+            try:
+                async with self.bot.pool.acquire() as conn:
+                    await conn.execute(statement, params)
+            except sqlite3.Error as exc:
+                logger.error(f"Dropping game result {params}: {exc}")
+                self.dropped += 1
+            else:
+                self.written += 1
+
+    async def close(self) -> None:
+        self.full.set()
+        if self.task:
+            await asyncio.gather(self.task, return_exceptions=True)
+
+        # Failed rows are put back, keep flushing until they are written or dropped
+        for _ in range(self.max_attempts):
+            await self.flush()
+            if not self.pending:
+                break
+
+        if self.task:
+            self.task.cancel()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import discord
+import time
+
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Iterable, Optional
+
+
+class SnipedMessage:
+    # Only what Fun.snipe renders is kept, the full Message object is dropped
+    __slots__ = (
+        "id",
+        "author_id",
+        "author_name",
+        "author_avatar",
+        "content",
+        "created_at",
+        "attachment",
+        "embed_url",
+        "embed_description",
+        "deleted_at",
+    )
+
+    def __init__(self, message: discord.Message) -> None:
+        self.id: int = message.id
+        self.author_id: int = message.author.id
+        self.author_name: str = message.author.display_name
+        self.author_avatar: str = message.author.display_avatar.url
+        self.content: str = message.content
+        self.created_at: datetime = message.created_at
+        self.attachment: Optional[str] = (
+            message.attachments[0].filename if message.attachments else None
+        )
+        self.embed_url: Optional[str] = (
+            message.embeds[0].url if message.embeds else None
+        )
+        self.embed_description: Optional[str] = (
+            message.embeds[0].description if message.embeds else None
+        )
+        self.deleted_at = time.monotonic()
+
+
+class SnipeStore:
+    def __init__(
+        self, *, depth: int = 10, ttl: float = 3600.0, max_entries: int = 5000
+    ) -> None:
+        self.depth = depth
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # Least recently used channels first, newest deletion first within a channel
+        self.channels: OrderedDict[int, Deque[SnipedMessage]] = OrderedDict()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, channel_id: int, message: discord.Message) -> None:
+        self.extend(channel_id, [message])
+
+    def extend(self, channel_id: int, messages: Iterable[discord.Message]) -> None:
+        history = self.channels.get(channel_id)
+        if history is None:
+            history = self.channels[channel_id] = deque(maxlen=self.depth)
+        else:
+            self.channels.move_to_end(channel_id)
+
+        for message in sorted(messages, key=lambda m: m.created_at):
+            if len(history) == self.depth:
+                self.size -= 1
+
+            history.appendleft(SnipedMessage(message))
+            self.size += 1
+
+        self._evict()
+
+    def get(self, channel_id: int, index: int = 1) -> Optional[SnipedMessage]:
+        history = self.channels.get(channel_id)
+        if history is None:
+            return None
+
+        self._expire(channel_id, history)
+        if index < 1 or index > len(history):
+            return None
+
+        self.channels.move_to_end(channel_id)
+        return history[index - 1]
+
+    def history_length(self, channel_id: int) -> int:
+        history = self.channels.get(channel_id)
+        if history is None:
+            return 0
+
+        self._expire(channel_id, history)
+        return len(history)
+
+    def _expire(self, channel_id: int, history: Deque[SnipedMessage]) -> None:
+        deadline = time.monotonic() - self.ttl
+        while history and history[-1].deleted_at < deadline:
+            history.pop()
+            self.size -= 1
+
+        if not history:
+            del self.channels[channel_id]
+
+    def _evict(self) -> None:
+        while self.size > self.max_entries and self.channels:
+            channel_id, history = next(iter(self.channels.items()))
+            history.pop()
+            self.size -= 1
+
+            if not history:
+                del self.channels[channel_id]
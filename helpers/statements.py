@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from helpers.database import RoutedConnection
+
+
+class Statement:
+    __slots__ = ("name", "sql", "scans")
+
+    def __init__(self, name: str, sql: str, *, scans: bool = False) -> None:
+        self.name = name
+        self.sql = sql
+        # Statements that read a whole table on purpose, like the startup cache loads
+        self.scans = scans
+
+
+# Every query the bot runs, by name. sqlite3 caches prepared statements per connection keyed by
+# their exact text, so each one is written once here and imported everywhere it is used
+REGISTRY: Dict[str, Statement] = {}
+
+
+def register(name: str, sql: str, *, scans: bool = False) -> str:
+    # One canonical spelling, so indentation differences never produce a second cache entry
+    sql = " ".join(sql.split())
+
+    existing = REGISTRY.get(name)
+    if existing is not None and existing.sql != sql:
+        raise ValueError(f"Statement {name} is already registered with other SQL.")
+
+    REGISTRY[name] = Statement(name, sql, scans=scans)
+    return sql
+
+
+def cache_size() -> int:
+    # Room for every registered statement plus the ad-hoc ones (pragmas, migrations) around them
+    return max(128, len(REGISTRY) + 64)
+
+
+async def explain(conn: RoutedConnection) -> Dict[str, List[str]]:
+    plans: Dict[str, List[str]] = {}
+    for statement in REGISTRY.values():
+        # The plan doesn't depend on the values, NULL is bound to every placeholder
+        rows = await conn.fetchall(
+            f"EXPLAIN QUERY PLAN {statement.sql}",
+            (None,) * statement.sql.count("?"),
+        )
+        plans[statement.name] = [row["detail"] for row in rows]
+
+    return plans
+
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN table" reads every row, and so does "SCAN table USING [COVERING] INDEX", it only walks
+    # them in index order. A subquery or a constant row is fine
+    return detail.startswith("SCAN ") and not (
+        "CONSTANT ROW" in detail or detail.startswith("SCAN (")
+    )
+
+
+def full_scans(plans: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    return [
+        (name, detail)
+        for name, details in plans.items()
+        if not REGISTRY[name].scans
+        for detail in details
+        if is_full_scan(detail)
+    ]
+
+
+# Guild settings
+
+ALL_PREFIXES = register(
+    "prefixes.all", "SELECT guild_id, prefix FROM prefixes", scans=True
+)
+GUILD_PREFIXES = register(
+    "prefixes.guild", "SELECT prefix FROM prefixes WHERE guild_id = ?"
+)
+ADD_PREFIX = register(
+    "prefixes.add", "INSERT OR IGNORE INTO prefixes (guild_id, prefix) VALUES (?, ?)"
+)
+REMOVE_PREFIX = register(
+    "prefixes.remove", "DELETE FROM prefixes WHERE guild_id = ? AND prefix = ?"
+)
+
+ALL_DISABLED_ENTITIES = register(
+    "configuration.all", "SELECT guild_id, entity FROM configuration", scans=True
+)
+DISABLE_ENTITY = register(
+    "configuration.disable",
+    "INSERT OR IGNORE INTO configuration (guild_id, entity, disabled) VALUES (?, ?, ?)",
+)
+ENABLE_ENTITY = register(
+    "configuration.enable",
+    "DELETE FROM configuration WHERE entity = ? AND guild_id = ?",
+)
+
+ALL_CAPTURE_MODES = register(
+    "attachment_capture.all",
+    "SELECT guild_id, mode FROM attachment_capture",
+    scans=True,
+)
+SET_CAPTURE_MODE = register(
+    "attachment_capture.set",
+    "INSERT OR REPLACE INTO attachment_capture (guild_id, mode) VALUES (?, ?)",
+)
+
+ADD_GUILD = register("guild_data.add", "INSERT INTO guild_data (guild_id) VALUES (?)")
+GUILD_LOGGING = register(
+    "guild_data.logging",
+    "SELECT log_webhook, log_channel FROM guild_data WHERE guild_id = ?",
+)
+GUILD_LOG_CHANNEL = register(
+    "guild_data.log_channel", "SELECT log_channel FROM guild_data WHERE guild_id = ?"
+)
+SET_LOG_WEBHOOK = register(
+    "guild_data.set_webhook",
+    "UPDATE guild_data SET log_webhook = ? WHERE guild_id = ?",
+)
+SET_LOGGING = register(
+    "guild_data.set_logging",
+    "UPDATE guild_data SET log_channel = ?, log_webhook = ? WHERE guild_id = ?",
+)
+
+# Game results, written in batches by the result buffer
+
+TRIVIA_SCORE_UPSERT = register(
+    "trivia.score",
+    """
+    INSERT INTO trivia (guild_id, user_id, correct, wrong, streak) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (guild_id, user_id) DO UPDATE SET
+        correct = correct + excluded.correct,
+        wrong = wrong + excluded.wrong,
+        streak = MAX(streak, excluded.streak)
+    """,
+)
+
+MEMORY_TIME_UPSERT = register(
+    "memory.time",
+    """
+    INSERT INTO memory (guild_id, user_id, minutes, seconds, total_seconds) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (guild_id, user_id) DO UPDATE SET
+        minutes = excluded.minutes,
+        seconds = excluded.seconds,
+        total_seconds = excluded.total_seconds
+    WHERE excluded.total_seconds < memory.total_seconds
+    """,
+)
+
+GUESS_WIN_UPSERT = register(
+    "guess.win",
+    """
+    INSERT INTO guess (guild_id, user_id, wins) VALUES (?, ?, 1)
+    ON CONFLICT (guild_id, user_id) DO UPDATE SET wins = wins + 1
+    """,
+)
+
+TICTACTOE_RESULT_INSERT = register(
+    "tictactoe.result",
+    "INSERT INTO tictactoe (winner, rival, guild_id) VALUES (?, ?, ?)",
+)
+RPS_RESULT_INSERT = register(
+    "rps.result", "INSERT INTO rps (winner, rival, guild_id) VALUES (?, ?, ?)"
+)
+
+TICTACTOE_MATCHES = register(
+    "tictactoe.matches",
+    "SELECT winner, rival FROM tictactoe WHERE winner = ? OR rival = ?",
+)
+RPS_MATCHES = register(
+    "rps.matches", "SELECT winner, rival FROM rps WHERE winner = ? OR rival = ?"
+)
+
+# Trivia question bank
+
+ADD_TRIVIA_QUESTION = register(
+    "trivia_questions.add",
+    "INSERT OR IGNORE INTO trivia_questions (category, difficulty, type, question, correct_answer, incorrect_answers) VALUES (?, ?, ?, ?, ?, ?)",
+)
+# Separately, each one is a single seek on the rowid, together SQLite scans the table for them
+TRIVIA_QUESTION_BOUNDS = register(
+    "trivia_questions.bounds",
+    "SELECT (SELECT MIN(id) FROM trivia_questions), (SELECT MAX(id) FROM trivia_questions)",
+)
+MARK_QUESTION_SEEN = register(
+    "trivia_seen.add",
+    "INSERT OR IGNORE INTO trivia_seen (user_id, question_id) VALUES (?, ?)",
+)
+MARK_QUESTION_TEXT_SEEN = register(
+    "trivia_seen.add_by_question",
+    "INSERT OR IGNORE INTO trivia_seen (user_id, question_id) SELECT ?, id FROM trivia_questions WHERE question = ?",
+)
+
+
+def _trivia_sample(difficulty: bool, category: bool) -> str:
+    # Only the filters that are set end up in the query, so it always matches one of the indexes
+    filters = ["type = ?"]
+    if difficulty:
+        filters.append("difficulty = ?")
+    if category:
+        filters.append("category = ?")
+
+    name = (
+        "type"
+        + ("+difficulty" if difficulty else "")
+        + ("+category" if category else "")
+    )
+    return register(
+        f"trivia_questions.sample.{name}",
+        f"""
+        SELECT id, category, difficulty, type, question, correct_answer, incorrect_answers
+        FROM trivia_questions
+        WHERE {" AND ".join(filters)} AND id >= ?
+        AND id NOT IN (SELECT question_id FROM trivia_seen WHERE user_id = ?)
+        ORDER BY id LIMIT 1
+        """,
+    )
+
+
+# (difficulty set, category set) -> query
+TRIVIA_SAMPLES: Dict[Tuple[bool, bool], str] = {
+    (difficulty, category): _trivia_sample(difficulty, category)
+    for difficulty in (False, True)
+    for category in (False, True)
+}
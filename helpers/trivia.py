@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import aiohttp
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from collections import deque
+from helpers import statements
+from typing import Any, Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..main import Jovanes
+
+logger = logging.getLogger("discord")
+
+TRIVIA_URL = "https://opentdb.com/api.php"
+TOKEN_URL = "https://opentdb.com/api_token.php"
+TRIVIA_TYPES = ("boolean", "multiple")
+TRIVIA_DIFFICULTIES = ("easy", "medium", "hard")
+
+# opentdb only allows one request every 5 seconds per IP
+REQUEST_INTERVAL = 5.0
+
+Question = Dict[str, Any]
+BucketKey = Tuple[str, Optional[str]]  # (type, difficulty), no difficulty means any
+
+
+class TriviaPool:
+    def __init__(
+        self,
+        *,
+        batch_size: int = 50,
+        low_water: int = 10,
+        snapshot_path: str = "./database/trivia_pool.json",
+        fixture_path: Optional[str] = None,
+    ) -> None:
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.snapshot_path = snapshot_path
+        self.fixture_path = fixture_path or os.getenv("TRIVIA_FIXTURE")
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.token: Optional[str] = None
+        self.buckets: Dict[BucketKey, Deque[Question]] = {}
+        self.refills: Dict[BucketKey, asyncio.Task] = {}
+        self.lock = asyncio.Lock()
+        self.last_request = 0.0
+
+        self.fetched = 0
+        self.served = 0
+        self.waited = 0
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def bucket(self, key: BucketKey) -> Deque[Question]:
+        return self.buckets.setdefault(key, deque())
+
+    async def start(self, session: aiohttp.ClientSession) -> None:
+        self.session = session
+        self.load_snapshot()
+
+        for _type in TRIVIA_TYPES:
+            if len(self.bucket((_type, None))) < self.low_water:
+                self.schedule_refill((_type, None))
+
+    async def close(self) -> None:
+        for task in self.refills.values():
+            task.cancel()
+
+        try:
+            self.save_snapshot()
+        except OSError:
+            logger.warning("Unable to write the trivia pool snapshot.")
+
+    def load_snapshot(self) -> None:
+        if not os.path.exists(self.snapshot_path):
+            return
+
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as fp:
+                snapshot: Dict[str, List[Question]] = json.load(fp)
+        except (OSError, ValueError):
+            logger.warning("Unable to read the trivia pool snapshot.")
+            return
+
+        for key, questions in snapshot.items():
+            _type, _, difficulty = key.partition(":")
+            self.bucket((_type, difficulty or None)).extend(questions)
+
+    def save_snapshot(self) -> None:
+        snapshot = {
+            f"{_type}:{difficulty or ''}": list(bucket)
+            for (_type, difficulty), bucket in self.buckets.items()
+            if bucket
+        }
+        with open(self.snapshot_path, "w", encoding="utf-8") as fp:
+            json.dump(snapshot, fp)
+
+    async def get(self, _type: str, difficulty: Optional[str] = None) -> Question:
+        key = (_type, difficulty)
+        bucket = self.bucket(key)
+
+        if not bucket:
+            # Only an empty pool makes the command wait on opentdb
+            self.waited += 1
+            self.schedule_refill(key)
+            await asyncio.shield(self.refills[key])
+
+            if not bucket:
+                raise LookupError(f"No trivia questions are available for {key}.")
+
+        question = bucket.popleft()
+        self.served += 1
+
+        if len(bucket) < self.low_water:
+            self.schedule_refill(key)
+
+        return question
+
+    def schedule_refill(self, key: BucketKey) -> None:
+        if key in self.refills:
+            return
+
+        task = asyncio.create_task(self._refill(key))
+        self.refills[key] = task
+        task.add_done_callback(lambda _: self.refills.pop(key, None))
+
+    async def _refill(self, key: BucketKey) -> None:
+        try:
+            if self.fixture_path:
+                questions = self._load_fixture(key)
+            else:
+                questions = await self._fetch(key)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as exc:
+            logger.warning(f"Unable to refill the trivia pool for {key}: {exc}")
+            return
+
+        self.bucket(key).extend(questions)
+        self.fetched += len(questions)
+
+    def _load_fixture(self, key: BucketKey) -> List[Question]:
+        _type, difficulty = key
+        with open(self.fixture_path, encoding="utf-8") as fp:  # type: ignore
+            data = json.load(fp)
+
+        # Either the full opentdb response or just its list of questions
+        if isinstance(data, dict):
+            data = data["results"]
+
+        questions = [
+            q
+            for q in data
+            if q["type"] == _type and (not difficulty or q["difficulty"] == difficulty)
+        ]
+        random.shuffle(questions)
+        return questions[: self.batch_size]
+
+    async def _request(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        assert self.session
+
+        async with self.lock:
+            delay = self.last_request + REQUEST_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self.session.get(
+                    url, params=params, timeout=aiohttp.ClientTimeout(total=10)
+                ) as resp:
+                    return await resp.json(content_type=None)
+            finally:
+                self.last_request = time.monotonic()
+
+    async def _fetch(self, key: BucketKey) -> List[Question]:
+        _type, difficulty = key
+
+        if not self.token:
+            data = await self._request(TOKEN_URL, {"command": "request"})
+            self.token = data.get("token")
+
+        params: Dict[str, Any] = {"amount": self.batch_size, "type": _type}
+        if difficulty:
+            params["difficulty"] = difficulty
+
+        for _ in range(3):
+            if self.token:
+                params["token"] = self.token
+
+            data = await self._request(TRIVIA_URL, params)
+
+            match data.get("response_code"):
+                case 0:
+                    return data["results"]
+                case 1:  # Not enough questions left for this amount
+                    params["amount"] = max(1, params["amount"] // 2)
+                case 3:  # Token not found
+                    data = await self._request(TOKEN_URL, {"command": "request"})
+                    self.token = data.get("token")
+                case 4:  # Every question was served to this token, start over
+                    await self._request(
+                        TOKEN_URL, {"command": "reset", "token": self.token}
+                    )
+                case _:  # Rate limited or invalid parameters
+                    pass
+
+        return []
+
+
+class TriviaBank:
+    def __init__(self, bot: Jovanes) -> None:
+        self.bot = bot
+
+        self.served = 0
+        self.exhausted = 0
+
+    def _to_question(self, row: Any) -> Question:
+        return {
+            "id": row[0],
+            "category": row[1],
+            "difficulty": row[2],
+            "type": row[3],
+            "question": row[4],
+            "correct_answer": row[5],
+            "incorrect_answers": json.loads(row[6]),
+        }
+
+    async def add(
+        self, questions: List[Question], *, seen_by: Optional[int] = None
+    ) -> int:
+        rows = [
+            (
+                q["category"],
+                q["difficulty"],
+                q["type"],
+                q["question"],
+                q["correct_answer"],
+                json.dumps(q["incorrect_answers"]),
+            )
+            for q in questions
+        ]
+
+        async with self.bot.pool.acquire() as conn:
+            # rowcount adds up over executemany, ignored duplicates count as 0
+            cursor = await conn.executemany(statements.ADD_TRIVIA_QUESTION, rows)
+            inserted = cursor.get_cursor().rowcount
+
+            if seen_by is not None:
+                await conn.executemany(
+                    statements.MARK_QUESTION_TEXT_SEEN,
+                    [(seen_by, q["question"]) for q in questions],
+                )
+
+        return inserted
+
+    async def sample(
+        self,
+        user_id: int,
+        _type: str,
+        difficulty: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> Optional[Question]:
+        params = [_type]
+        if difficulty:
+            params.append(difficulty)
+        if category:
+            params.append(category)
+
+        query = statements.TRIVIA_SAMPLES[(bool(difficulty), bool(category))]
+
+        async with self.bot.pool.acquire() as conn:
+            bounds = await conn.fetchone(statements.TRIVIA_QUESTION_BOUNDS)
+            if bounds[0] is None:
+                return None
+
+            # Seek from a random id instead of ORDER BY RANDOM(), wrapping around once
+            pivot = random.randint(bounds[0], bounds[1])
+            row = await conn.fetchone(query, (*params, pivot, user_id))
+            if not row and pivot != bounds[0]:
+                row = await conn.fetchone(query, (*params, bounds[0], user_id))
+
+            if not row:
+                self.exhausted += 1
+                return None
+
+            await conn.execute(statements.MARK_QUESTION_SEEN, (user_id, row[0]))
+
+        self.served += 1
+        return self._to_question(row)
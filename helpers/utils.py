@@ -4,7 +4,9 @@ import html
 import discord
 import re
 
-from typing import TYPE_CHECKING
+from helpers import migrations, statements
+
+from typing import Any, List, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..main import Jovanes
@@ -12,106 +14,109 @@ if TYPE_CHECKING:
 
 
 async def set_up_database(conn: ProxiedConnection) -> None:
-    sql_script = """
-        CREATE TABLE IF NOT EXISTS guild_data (
-            guild_id INT NOT NULL,
-            log_channel INT,
-            log_webhook VARCHAR(150),
-            PRIMARY KEY (guild_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS prefixes (
-            guild_id INT NOT NULL,
-            prefix CHAR(16)
-        );
-
-        CREATE TABLE IF NOT EXISTS trivia (
-            user_id INT NOT NULL,
-            correct INT,
-            wrong INT,
-            streak INT,
-            PRIMARY KEY (user_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS configuration (
-            guild_id INT NOT NULL,
-            entity CHAR(40),
-            disabled INT
-        );
-
-        CREATE TABLE IF NOT EXISTS memory (
-            user_id INT NOT NULL,
-            minutes INT,
-            seconds INT,
-            total_seconds INT,
-            PRIMARY KEY (user_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS tictactoe (
-            winner INT NOT NULL,
-            rival INT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS rps (
-            winner INT NOT NULL,
-            rival INT NOT NULL
-        );
-
-        CREATE TABLE IF NOT EXISTS guess (
-            user_id INT NOT NULL,
-            wins INT,
-            PRIMARY KEY (user_id)
-        );
-    """
-
-    await conn.executescript(sql_script)
+    await migrations.migrate(conn)
 
 
 def sanitize_response(string: str) -> str:
     return html.unescape(string)
 
 
-async def update_trivia_score(bot: Jovanes, user_id: int, is_correct: bool) -> None:
+GLOBAL_SCOPE = 0
+
+
+def record_scoped(
+    bot: Jovanes, statement: str, guild_id: int, params: Tuple[Any, ...]
+) -> None:
+    # Scores are kept once for the guild they were earned in and once globally
+    for scope in {GLOBAL_SCOPE, guild_id}:
+        bot.results.record(statement, (scope, *params))
+
+
+def update_trivia_score(
+    bot: Jovanes, guild_id: int, user_id: int, is_correct: bool
+) -> None:
     if user_id in bot.trivia_streaks:
         bot.trivia_streaks[user_id] += 1 if is_correct else 0
     else:
         bot.trivia_streaks[user_id] = 1 if is_correct else 0
 
-    async with bot.pool.acquire() as conn:
-        res = await conn.fetchone(
-            "SELECT correct, wrong, streak FROM trivia WHERE user_id = ?", (user_id,)
-        )
-
-        if not res:
-            if is_correct:
-                correct, wrong = 1, 0
-            else:
-                correct, wrong = 0, 1
-            await conn.execute(
-                "INSERT INTO trivia (user_id, correct, wrong, streak) VALUES (?, ?, ?, ?)",
-                (user_id, correct, wrong, bot.trivia_streaks[user_id]),
-            )
-        else:
-            correct, wrong, streak = res
-            if is_correct:
-                correct += 1
-            else:
-                wrong += 1
-
-            if bot.trivia_streaks[user_id] > streak:
-                query, params = (
-                    "UPDATE trivia SET correct = ?, wrong = ?, streak = ? WHERE user_id = ?",
-                    (correct, wrong, bot.trivia_streaks[user_id], user_id),
-                )
-            else:
-                query, params = (
-                    "UPDATE trivia SET correct = ?, wrong = ? WHERE user_id = ?",
-                    (correct, wrong, user_id),
-                )
-
-            await conn.execute(query, params)
-
-        await conn.commit()
+    record_scoped(
+        bot,
+        statements.TRIVIA_SCORE_UPSERT,
+        guild_id,
+        (user_id, int(is_correct), int(not is_correct), bot.trivia_streaks[user_id]),
+    )
+
+
+def update_memory_time(
+    bot: Jovanes, guild_id: int, user_id: int, minutes: int, seconds: int
+) -> None:
+    record_scoped(
+        bot,
+        statements.MEMORY_TIME_UPSERT,
+        guild_id,
+        (user_id, minutes, seconds, minutes * 60 + seconds),
+    )
+
+
+def add_guess_win(bot: Jovanes, guild_id: int, user_id: int) -> None:
+    record_scoped(bot, statements.GUESS_WIN_UPSERT, guild_id, (user_id,))
+
+
+def record_match(
+    bot: Jovanes, statement: str, guild_id: int, winner_id: int, rival_id: int
+) -> None:
+    # The stats triggers fan a match out to the guild and global counters
+    bot.results.record(statement, (winner_id, rival_id, guild_id))
+
+
+def pack_batches(
+    texts: List[str], max_items: int, max_characters: int
+) -> List[List[int]]:
+    # Greedily packs consecutive texts, returns the indices of every batch
+    batches: List[List[int]] = []
+    current: List[int] = []
+    characters = 0
+
+    for i, text in enumerate(texts):
+        if current and (
+            len(current) == max_items or characters + len(text) > max_characters
+        ):
+            batches.append(current)
+            current, characters = [], 0
+
+        current.append(i)
+        characters += len(text)
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def pack_lines(lines: List[str], limit: int) -> List[str]:
+    # Joins lines into chunks of at most limit characters, a line that is too long on its own is split
+    chunks: List[str] = []
+    current = ""
+
+    for line in lines:
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = ""
+
+        current = f"{current}\n{line}" if current else line
+
+    if current:
+        chunks.append(current)
+
+    return chunks
 
 
 def is_odd(num: int) -> bool:
@@ -5,9 +5,11 @@ import random
 import uuid
 import asyncio
 import json
+import sqlite3
 
-from helpers import utils as _utils
-from typing import Any, Optional, List, Dict, TYPE_CHECKING
+from helpers import statements, utils as _utils
+from helpers.leaderboards import Leaderboard, PAGE_SIZE
+from typing import Any, Optional, List, Dict, Tuple, TYPE_CHECKING
 from config import reactionFailure, reactionSuccess
 
 if TYPE_CHECKING:
@@ -64,7 +66,7 @@ class TriviaMultiple(discord.ui.View):
                 if item.label == self.correct_answer:
                     item.style = discord.ButtonStyle.green
 
-        await _utils.update_trivia_score(self.bot, self.user.id, False)
+        _utils.update_trivia_score(self.bot, self.user.guild.id, self.user.id, False)
         self.embed.color = discord.Color.red()
         self.embed.remove_field(3)
         self.embed.add_field(
@@ -84,8 +86,8 @@ class TriviaMultiple(discord.ui.View):
         if clicked_button.label == self.correct_answer:
             clicked_button.style = discord.ButtonStyle.green
 
-            await _utils.update_trivia_score(
-                interaction.client, interaction.user.id, True
+            _utils.update_trivia_score(
+                interaction.client, self.user.guild.id, interaction.user.id, True
             )
             self.embed.color = discord.Color.green()
             self.embed.remove_field(3)
@@ -103,8 +105,8 @@ class TriviaMultiple(discord.ui.View):
                 ):
                     item.style = discord.ButtonStyle.green
 
-            await _utils.update_trivia_score(
-                interaction.client, interaction.user.id, False
+            _utils.update_trivia_score(
+                interaction.client, self.user.guild.id, interaction.user.id, False
             )
             self.embed.color = discord.Color.red()
             self.embed.remove_field(3)
@@ -143,7 +145,7 @@ class TriviaBool(discord.ui.View):
                 if item.label == self.correct_answer:
                     item.style = discord.ButtonStyle.green
 
-        await _utils.update_trivia_score(self.bot, self.user.id, False)
+        _utils.update_trivia_score(self.bot, self.user.guild.id, self.user.id, False)
         self.embed.color = discord.Color.red()
         self.embed.remove_field(3)
         self.embed.add_field(
@@ -173,8 +175,8 @@ class TriviaBool(discord.ui.View):
         if button.label == self.correct_answer:
             button.style = discord.ButtonStyle.green
 
-            await _utils.update_trivia_score(
-                interaction.client, interaction.user.id, True
+            _utils.update_trivia_score(
+                interaction.client, self.user.guild.id, interaction.user.id, True
             )
             self.embed.color = discord.Color.green()
             self.embed.remove_field(3)
@@ -188,8 +190,8 @@ class TriviaBool(discord.ui.View):
             correct_button = self.false if self.correct_answer == "False" else self.true
             correct_button.style = discord.ButtonStyle.green
 
-            await _utils.update_trivia_score(
-                interaction.client, interaction.user.id, False
+            _utils.update_trivia_score(
+                interaction.client, self.user.guild.id, interaction.user.id, False
             )
             self.embed.color = discord.Color.red()
             self.embed.remove_field(3)
@@ -298,28 +300,9 @@ class Memory(discord.ui.View):
                 content=f"Congrats {self.user.mention}, you finished in {int(minutes)} minute(s) and {int(seconds)} seconds."
             )
 
-            async with self.bot.pool.acquire() as conn:
-                res = await conn.fetchone(
-                    "SELECT minutes, seconds FROM memory WHERE user_id = ?",
-                    (self.user.id),
-                )
-
-            if not res:
-                current_time = int(minutes) * 60 + int(seconds)
-                await conn.execute(
-                    "INSERT INTO memory (user_id, minutes, seconds, total_seconds) VALUES (?, ?, ?, ?)",
-                    (self.user.id, int(minutes), int(seconds), current_time),
-                )
-                await conn.commit()
-            else:
-                saved_time = res[0] * 60 + res[1]
-                current_time = int(minutes) * 60 + int(seconds)
-                if current_time < saved_time:
-                    await conn.execute(
-                        "UPDATE memory SET minutes = ?, seconds = ?, total_seconds = ? WHERE user_id = ?",
-                        (int(minutes), int(seconds), current_time, self.user.id),
-                    )
-                    await conn.commit()
+            _utils.update_memory_time(
+                self.bot, self.guild.id, self.user.id, int(minutes), int(seconds)
+            )
 
     async def on_timeout(self) -> None:
         for index, item in enumerate(self.children, start=1):
@@ -464,11 +447,13 @@ class TicTacToe(discord.ui.View):
             timestamp=discord.utils.utcnow(),
         )
 
-        async with bot.pool.acquire() as conn:
-            await conn.execute(
-                "INSERT INTO tictactoe (winner, rival) VALUES (?, ?)",
-                (winner.id, rival.id),
-            )
+        _utils.record_match(
+            bot,
+            statements.TICTACTOE_RESULT_INSERT,
+            winner.guild.id,
+            winner.id,
+            rival.id,
+        )
 
         await message.edit(embed=e, view=self)
 
@@ -497,11 +482,13 @@ class TicTacToe(discord.ui.View):
         self.stop()
 
         rival = self.player_1 if self.current_turn.id == self.player_2.id else self.player_2  # type: ignore
-        async with interaction.client.pool.acquire() as conn:
-            await conn.execute(
-                "INSERT INTO tictactoe (winner, rival) VALUES (?, ?)",
-                (interaction.user.id, rival.id),
-            )
+        _utils.record_match(
+            interaction.client,
+            statements.TICTACTOE_RESULT_INSERT,
+            self.player_1.guild.id,
+            interaction.user.id,
+            rival.id,
+        )
 
         await interaction.response.edit_message(view=self, embed=e)
 
@@ -748,11 +735,13 @@ class RPS(discord.ui.View):
             self.embed.color = discord.Color.green()
 
             rival = self.player_1 if winner.id == self.player_2.id else self.player_2
-            async with interaction.client.pool.acquire() as conn:
-                await conn.execute(
-                    "INSERT INTO rps (winner, rival) VALUES (?, ?)",
-                    (winner.id, rival.id),
-                )
+            _utils.record_match(
+                interaction.client,
+                statements.RPS_RESULT_INSERT,
+                self.player_1.guild.id,
+                winner.id,
+                rival.id,
+            )
         else:
             self.embed.description = (
                 "Both the players made the same move. Game ended in a draw."
@@ -890,24 +879,11 @@ class GuessModal(discord.ui.Modal):
             self.view.guess.disabled = True
             self.view.guess.label = f"Winner: {interaction.user.display_name}"
 
-            async with interaction.client.pool.acquire() as conn:
-                res = await conn.fetchone(
-                    "SELECT win FROM guess WHERE user_id = ?", (interaction.user.id)
-                )
-
-                if not res:
-                    await conn.execute(
-                        "INSERT INTO guess (user_id, wins) VALUES (?, ?)",
-                        (interaction.user.id, 1),
-                    )
-                else:
-                    wins = res[0]
-                    wins += 1
-
-                    await conn.execute(
-                        "UPDATE guess SET wins = ? WHERE user_id = ?",
-                        (wins, interaction.user.id),
-                    )
+            _utils.add_guess_win(
+                interaction.client,
+                interaction.guild_id or _utils.GLOBAL_SCOPE,
+                interaction.user.id,
+            )
 
             if self.view.message:
                 await self.view.message.edit(embed=self.view.embed, view=self)
@@ -1005,6 +981,11 @@ class TextPaginator(discord.ui.View):
         if self.message:
             await self.message.edit(view=self)
 
+    def add_pages(self, page: int, rows: List[sqlite3.Row]) -> None:
+        self.pages[page] = rows[: self.page_size]
+        if len(rows) > self.page_size:
+            self.pages[page + 1] = rows[self.page_size :]
+
     def configure_button_availability(self) -> None:
         if self.current_page == 1:
             self.rewind.disabled = True
@@ -1075,6 +1056,162 @@ class TextPaginator(discord.ui.View):
         )
 
 
+class LeaderboardPaginator(discord.ui.View):
+    def __init__(
+        self,
+        bot: Jovanes,
+        leaderboard: Leaderboard,
+        total: int,
+        *,
+        guild: Optional[discord.Guild] = None,
+        fields: Optional[List[Tuple[str, str]]] = None,
+        page_size: int = PAGE_SIZE,
+    ) -> None:
+        self.bot = bot
+        self.leaderboard = leaderboard
+        self.guild = guild
+        self.guild_id = guild.id if guild else _utils.GLOBAL_SCOPE
+        self.fields = fields or []
+        self.page_size = page_size
+        self.message: Optional[discord.Message] = None
+
+        # Only the current page and its neighbours are kept, everything else is fetched on demand
+        self.pages: Dict[int, List[sqlite3.Row]] = {}
+        self.highlight: Optional[int] = None
+
+        self.current_page = 0
+        self.total_pages = max(1, -(-total // page_size))
+        super().__init__(timeout=300.0)
+
+    async def on_timeout(self) -> None:
+        for item in self.children:
+            if isinstance(item, discord.ui.Button):
+                item.disabled = True
+
+        if self.message:
+            await self.message.edit(view=self)
+
+    async def load(self, page: int) -> List[sqlite3.Row]:
+        if page not in self.pages:
+            previous = self.pages.get(page - 1)
+            following = self.pages.get(page + 1)
+
+            # Two pages per query, the next one is usually what gets requested after this
+            if previous:
+                rows = await self.leaderboard.fetch_after(
+                    self.bot, self.guild_id, previous[-1], self.page_size * 2
+                )
+                self.add_pages(page, rows)
+            elif following:
+                self.pages[page] = await self.leaderboard.fetch_before(
+                    self.bot, self.guild_id, following[0], self.page_size
+                )
+            else:
+                rows = await self.leaderboard.fetch_at(
+                    self.bot, self.guild_id, page * self.page_size, self.page_size * 2
+                )
+                self.add_pages(page, rows)
+
+        for cached in list(self.pages):
+            if abs(cached - page) > 1:
+                del self.pages[cached]
+
+        self.current_page = page
+        self.configure_button_availability()
+        return self.pages[page]
+
+    def configure_button_availability(self) -> None:
+        self.previous.disabled = self.current_page == 0
+        self.next.disabled = self.current_page >= self.total_pages - 1
+        self.page_button.label = f"{self.current_page + 1}/{self.total_pages}"
+
+    def build_embed(self) -> discord.Embed:
+        e = discord.Embed(
+            title=(
+                f"{self.leaderboard.title} ({self.guild.name})"
+                if self.guild
+                else self.leaderboard.title
+            ),
+            color=discord.Color.random(),
+            timestamp=discord.utils.utcnow(),
+        )
+
+        lines = []
+        for position, row in enumerate(
+            self.pages.get(self.current_page, []),
+            start=self.current_page * self.page_size + 1,
+        ):
+            line = self.leaderboard.format(position, row)
+            lines.append(f"**{line}**" if row["user_id"] == self.highlight else line)
+
+        e.description = "\n".join(lines) or self.leaderboard.empty
+
+        for name, value in self.fields:
+            e.add_field(name=name, value=value, inline=False)
+
+        return e
+
+    async def start(self, ctx: Context[Jovanes]) -> None:
+        if not await self.load(0):
+            self.stop()
+            await ctx.send(embed=self.build_embed())
+            return
+
+        self.message = await ctx.send(embed=self.build_embed(), view=self)
+
+    async def show(self, interaction: discord.Interaction[Jovanes], page: int) -> None:
+        await self.load(page)
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.blurple)
+    async def previous(
+        self, interaction: discord.Interaction[Jovanes], button: discord.ui.Button
+    ) -> None:
+        await self.show(interaction, self.current_page - 1)
+
+    @discord.ui.button(label="0/0", style=discord.ButtonStyle.grey, disabled=True)
+    async def page_button(
+        self, interaction: discord.Interaction[Jovanes], button: discord.ui.Button
+    ) -> None: ...
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.blurple)
+    async def next(
+        self, interaction: discord.Interaction[Jovanes], button: discord.ui.Button
+    ) -> None:
+        await self.show(interaction, self.current_page + 1)
+
+    @discord.ui.button(label="My Rank", style=discord.ButtonStyle.grey)
+    async def my_rank(
+        self, interaction: discord.Interaction[Jovanes], button: discord.ui.Button
+    ) -> None:
+        row = await self.leaderboard.fetch_row(
+            self.bot, self.guild_id, interaction.user.id
+        )
+        if row is None:
+            await interaction.response.send_message(
+                "You are not on this leaderboard.", ephemeral=True
+            )
+            return
+
+        rank = await self.leaderboard.rank_of(self.bot, self.guild_id, row)
+        page, position = divmod(rank, self.page_size)
+
+        # The page is built around the user's own row, so no query has to skip the rows above it
+        before = (
+            await self.leaderboard.fetch_before(self.bot, self.guild_id, row, position)
+            if position
+            else []
+        )
+        after = await self.leaderboard.fetch_after(
+            self.bot, self.guild_id, row, self.page_size * 2 - position - 1
+        )
+
+        self.pages = {}
+        self.add_pages(page, [*before, row, *after])
+        self.highlight = interaction.user.id
+        await self.show(interaction, page)
+
+
 class PrefixRemoveSelect(discord.ui.Select["PrefixRemove"]):
     def __init__(self, prefixes: List[str]) -> None:
         self.prefixes = prefixes
@@ -1088,12 +1225,8 @@ class PrefixRemoveSelect(discord.ui.Select["PrefixRemove"]):
     async def callback(self, interaction: discord.Interaction[Jovanes]) -> Any:
         assert interaction.guild
 
-        async with interaction.client.pool.acquire() as conn:
-            actual_prefix = self.prefixes[self.stripped_prefixes.index(self.values[0])]
-            await conn.execute(
-                "DELETE FROM prefixes WHERE guild_id = ? AND prefix = ?",
-                (interaction.guild.id, actual_prefix),
-            )
+        actual_prefix = self.prefixes[self.stripped_prefixes.index(self.values[0])]
+        await interaction.client.remove_prefix(interaction.guild.id, actual_prefix)
 
         e = discord.Embed(
             title="Prefix Remover",
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import discord
+import asyncio
+import logging
+import io
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..main import Jovanes
+
+logger = logging.getLogger("discord")
+
+MAX_EMBEDS = 10  # Per webhook execution
+MAX_EMBED_CHARACTERS = 6000  # Combined across all embeds of a single message
+MAX_FILES = 10
+
+
+class LogEntry:
+    __slots__ = ("embed", "file")
+
+    def __init__(
+        self, embed: discord.Embed, file: Optional[Tuple[str, bytes]] = None
+    ) -> None:
+        self.embed = embed
+        self.file = (
+            file  # (filename, data), turned into a discord.File on every send attempt
+        )
+
+
+class LogQueue:
+    def __init__(
+        self, bot: Jovanes, *, window: float = 2.0, max_size: int = 200
+    ) -> None:
+        self.bot = bot
+        self.window = window
+        self.max_size = max_size
+
+        self.queues: Dict[int, Deque[LogEntry]] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+        self.dropped = 0
+        self.executions = 0
+        self.delivered = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def put(
+        self,
+        guild: discord.Guild,
+        embed: discord.Embed,
+        file: Optional[Tuple[str, bytes]] = None,
+    ) -> bool:
+        queue = self.queues.setdefault(guild.id, deque())
+        if len(queue) >= self.max_size:
+            self.dropped += 1
+            return False
+
+        queue.append(LogEntry(embed, file))
+
+        if guild.id not in self.tasks:
+            self.tasks[guild.id] = asyncio.create_task(self._deliver(guild.id))
+
+        return True
+
+    def _next_batch(self, queue: Deque[LogEntry]) -> List[LogEntry]:
+        batch: List[LogEntry] = []
+        characters = 0
+        files = 0
+
+        while queue and len(batch) < MAX_EMBEDS:
+            entry = queue[0]
+            size = len(entry.embed)
+            if batch and characters + size > MAX_EMBED_CHARACTERS:
+                break
+
+            if entry.file and files == MAX_FILES:
+                break
+
+            batch.append(queue.popleft())
+            characters += size
+            files += 1 if entry.file else 0
+
+        return batch
+
+    async def _deliver(self, guild_id: int) -> None:
+        try:
+            # Everything that arrives within the window shares one webhook execution
+            await asyncio.sleep(self.window)
+            await self._drain(guild_id)
+        finally:
+            self.tasks.pop(guild_id, None)
+
+    async def _drain(self, guild_id: int) -> None:
+        queue = self.queues.get(guild_id)
+
+        while queue:
+            await self._send(guild_id, self._next_batch(queue))
+
+            if queue:
+                # Stay well under the webhook bucket (5 requests per 2 seconds, 30 per minute per channel)
+                await asyncio.sleep(self.window)
+
+        self.queues.pop(guild_id, None)
+
+    def _build_kwargs(
+        self, guild: discord.Guild, batch: List[LogEntry]
+    ) -> Dict[str, Any]:
+        return {
+            "embeds": [entry.embed for entry in batch],
+            "files": [
+                discord.File(io.BytesIO(entry.file[1]), filename=entry.file[0])
+                for entry in batch
+                if entry.file
+            ],
+            "username": guild.me.display_name,
+            "avatar_url": guild.me.display_avatar.url,
+        }
+
+    async def _send(self, guild_id: int, batch: List[LogEntry]) -> None:
+        guild = self.bot.get_guild(guild_id)
+        webhook = await self.bot.get_logging_webhook(guild) if guild else None
+        if not guild or not webhook:
+            self.dropped += len(batch)
+            return
+
+        try:
+            try:
+                await webhook.send(**self._build_kwargs(guild, batch))
+            except discord.NotFound:
+                webhook = await self.bot.create_logging_webhook(guild)
+                if not webhook:
+                    self.dropped += len(batch)
+                    return
+
+                # Files are consumed by the failed attempt, so they are rebuilt
+                await webhook.send(**self._build_kwargs(guild, batch))
+        except discord.HTTPException as exc:
+            logger.warning(f"Unable to deliver logs for guild {guild_id}: {exc}")
+            self.dropped += len(batch)
+            return
+
+        self.executions += 1
+        self.delivered += len(batch)
+
+    async def close(self) -> None:
+        for task in list(self.tasks.values()):
+            task.cancel()
+
+        for guild_id in list(self.queues):
+            await self._drain(guild_id)
@@ -4,18 +4,27 @@ import discord
 from discord.ext import commands
 
 import aiohttp
-import asqlite
 import traceback
 import logging
 import os
 import asyncio
 
 from pkgutil import iter_modules
-from helpers import logger as _logger, utils as _utils
+from helpers import logger as _logger, statements, utils as _utils
 from helpers.errors import EntityDisabled
+from helpers.prefixes import PrefixMatcher
+from helpers.snipe import SnipeStore
+from helpers.attachments import AttachmentCache
+from helpers.cache import TTLCache
+from helpers.detection import LanguageDetector
+from helpers.trivia import TriviaPool, TriviaBank
+from helpers.webhooks import LogQueue
+from helpers.results import ResultBuffer
+from helpers.database import ConnectionProfile, Database, DatabaseMaintenance
+from helpers.instrumentation import QueryStats
 from datetime import datetime
 
-from typing import Optional, Dict, Union, List
+from typing import Any, Optional, Dict, Union, List, Set, Tuple
 from typing_extensions import Self
 from dotenv import load_dotenv
 
@@ -28,45 +37,54 @@ handler.setFormatter(_logger.Logger())
 logger.addHandler(handler)
 
 DEFAULT_PREFIXES = ["?"]
+DEFAULT_MATCHER = PrefixMatcher(DEFAULT_PREFIXES)
 
 
 class Jovanes(commands.Bot):
 
-    async def _get_prefix(self, bot: Self, message: discord.Message) -> List[str]:
+    async def _get_prefix(self, bot: Self, message: discord.Message) -> str:
         guild = message.guild
-        if not guild:
-            return DEFAULT_PREFIXES
+        if not guild or not self.pool:
+            matcher = DEFAULT_MATCHER
+        else:
+            matcher = await self.get_prefix_matcher(guild.id)
+            if len(matcher) == 0:
+                matcher = DEFAULT_MATCHER
 
-        if not self.pool:
-            return DEFAULT_PREFIXES
+        # Always a single string: handing discord.py the whole list on a miss makes it loop over every
+        # prefix again with startswith. The first prefix is already known not to match
+        prefix = matcher.match(message.content)
+        if prefix is None:
+            return matcher.prefixes[0]
 
-        async with self.pool.acquire() as conn:
-            res = await conn.fetchall(
-                "SELECT prefix FROM prefixes WHERE guild_id = ?", guild.id
-            )
-
-        if not res:
-            return DEFAULT_PREFIXES
-
-        prefixes: List[str] = []
-        for row in res:
-            prefixes.append(row[0])
-
-        if len(prefixes) == 0:
-            return DEFAULT_PREFIXES
-
-        return prefixes
+        return prefix
 
     def __init__(self) -> None:
         self._extensions = [m.name for m in iter_modules(["cogs"], prefix="cogs.")]
         self._extensions.extend(["jishaku"])
-        self.snipe_data: Dict[int, discord.Message] = {}
+        self.snipe_store = SnipeStore()
+        self.attachment_cache = AttachmentCache()
         self.logger = logger
         self.trivia_streaks: Dict[int, int] = {}
         self.logging_webhooks: Dict[int, discord.Webhook] = {}
+        self.log_queue = LogQueue(self)
+        self.results = ResultBuffer(self)
+        self.db_maintenance = DatabaseMaintenance(self)
+
+        self.prefix_cache: Dict[int, PrefixMatcher] = {}
+        self.prefix_cache_hits = 0
+        self.prefix_cache_misses = 0
+        self.disabled_entities: Dict[int, Set[str]] = {}
+        self.capture_modes: Dict[int, str] = {}
+        self.translation_cache: TTLCache[Tuple[str, str], Any] = TTLCache(
+            maxsize=2048, ttl=3600.0
+        )
+        self.language_detector = LanguageDetector()
+        self.trivia_pool = TriviaPool()
+        self.trivia_bank = TriviaBank(self)
 
         self._session: aiohttp.ClientSession
-        self.pool: asqlite.Pool
+        self.pool: Database
 
         super().__init__(
             command_prefix=self._get_prefix,
@@ -87,9 +105,31 @@ class Jovanes(commands.Bot):
         if not os.path.exists("./database"):
             os.mkdir("./database")
 
+        self.attachment_cache.setup(self._session)
+        await self.language_detector.start()
+        await self.trivia_pool.start(self._session)
+
         async with self.pool.acquire() as conn:
             await _utils.set_up_database(conn)
 
+            res = await conn.fetchall(statements.ALL_PREFIXES)
+            disabled = await conn.fetchall(statements.ALL_DISABLED_ENTITIES)
+            modes = await conn.fetchall(statements.ALL_CAPTURE_MODES)
+
+        self.db_maintenance.start()
+
+        self.capture_modes = {guild_id: mode for guild_id, mode in modes}
+
+        for guild_id, entity in disabled:
+            self.disabled_entities.setdefault(guild_id, set()).add(entity)
+
+        guild_prefixes: Dict[int, List[str]] = {}
+        for guild_id, prefix in res:
+            guild_prefixes.setdefault(guild_id, []).append(prefix)
+
+        for guild_id, prefixes in guild_prefixes.items():
+            self.prefix_cache[guild_id] = PrefixMatcher(prefixes)
+
         for extension in self._extensions:
             try:
                 await self.load_extension(extension)
@@ -104,34 +144,109 @@ class Jovanes(commands.Bot):
     async def on_ready(self) -> None:
         print(f"Logged in as {self.user}.")
 
-    async def is_entity_disabled(
+    async def get_prefix_matcher(self, guild_id: int) -> PrefixMatcher:
+        try:
+            matcher = self.prefix_cache[guild_id]
+        except KeyError:
+            self.prefix_cache_misses += 1
+        else:
+            self.prefix_cache_hits += 1
+            return matcher
+
+        async with self.pool.acquire() as conn:
+            res = await conn.fetchall(statements.GUILD_PREFIXES, guild_id)
+
+        matcher = self.prefix_cache[guild_id] = PrefixMatcher([row[0] for row in res])
+        return matcher
+
+    async def get_guild_prefixes(self, guild_id: int) -> List[str]:
+        matcher = await self.get_prefix_matcher(guild_id)
+        if len(matcher) == 0:
+            return list(DEFAULT_PREFIXES)
+
+        return list(matcher.prefixes)
+
+    async def add_prefix(self, guild_id: int, prefix: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(statements.ADD_PREFIX, (guild_id, prefix))
+
+        matcher = await self.get_prefix_matcher(guild_id)
+        if prefix not in matcher.prefixes:
+            self.prefix_cache[guild_id] = PrefixMatcher([*matcher.prefixes, prefix])
+
+    async def remove_prefix(self, guild_id: int, prefix: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(statements.REMOVE_PREFIX, (guild_id, prefix))
+
+        matcher = self.prefix_cache.get(guild_id)
+        if matcher is not None:
+            self.prefix_cache[guild_id] = PrefixMatcher(
+                [p for p in matcher.prefixes if p != prefix]
+            )
+
+    def is_entity_disabled(
         self, entity: Union[commands.Command, commands.Cog], guild_id: int
     ) -> bool:
-        if isinstance(entity, (commands.Command, commands.Cog)):
-            name = entity.qualified_name
+        disabled = self.disabled_entities.get(guild_id)
+        if not disabled:
+            return False
+
+        return entity.qualified_name in disabled
+
+    async def disable_entity(self, guild_id: int, name: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(statements.DISABLE_ENTITY, (guild_id, name, 1))
+
+        self.disabled_entities.setdefault(guild_id, set()).add(name)
+
+    async def enable_entity(self, guild_id: int, name: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(statements.ENABLE_ENTITY, (name, guild_id))
+
+        self.disabled_entities.get(guild_id, set()).discard(name)
 
-            async with self.pool.acquire() as conn:
-                res = await conn.fetchone(
-                    "SELECT entity FROM configuration WHERE guild_id = ? AND entity = ?",
-                    (guild_id, name),
-                )
+    async def set_capture_mode(self, guild_id: int, mode: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(statements.SET_CAPTURE_MODE, (guild_id, mode))
 
-            return res is not None
+        self.capture_modes[guild_id] = mode
 
     async def close(self) -> None:
+        # Pending game results are written before anything else that could fail on the way out
+        await bot.results.close()
+        await bot.log_queue.close()
+        await bot.attachment_cache.close()
+        bot.language_detector.close()
+        await bot.trivia_pool.close()
+        await bot.db_maintenance.close()
         await bot.pool.close()
         await bot._session.close()
 
         bot.logger.info("Shutting down the bot...")
         await super().close()
 
+    async def get_logging_webhook(
+        self, guild: discord.Guild
+    ) -> Optional[discord.Webhook]:
+        if guild.id in self.logging_webhooks:
+            return self.logging_webhooks[guild.id]
+
+        async with self.pool.acquire() as conn:
+            res = await conn.fetchone(statements.GUILD_LOGGING, (guild.id))
+
+        if not res or not res[0]:
+            return
+
+        webhook = self.logging_webhooks[guild.id] = discord.Webhook.from_url(
+            res[0], session=self._session
+        )
+        return webhook
+
     async def create_logging_webhook(
         self, guild: discord.Guild
     ) -> Optional[discord.Webhook]:
         async with self.pool.acquire() as conn:
-            res = await conn.fetchone(
-                "SELECT log_channel FROM guild_data WHERE guild_id = ?", (guild.id)
-            )
+            res = await conn.fetchone(statements.GUILD_LOG_CHANNEL, (guild.id))
 
             if not res[0]:
                 return
@@ -143,10 +258,7 @@ class Jovanes(commands.Bot):
             webhook = await channel.create_webhook(name=self.user.name)  # type: ignore
             self.logging_webhooks[guild.id] = webhook
 
-            await conn.execute(
-                "UPDATE guild_data SET log_webhook = ? WHERE guild_id = ?",
-                (webhook.url, guild.id),
-            )
+            await conn.execute(statements.SET_LOG_WEBHOOK, (webhook.url, guild.id))
             return webhook
 
 
@@ -156,7 +268,7 @@ bot = Jovanes()
 
 
 @bot.check
-async def disabled_check(ctx: commands.Context[Jovanes]) -> bool:
+def disabled_check(ctx: commands.Context[Jovanes]) -> bool:
     if not ctx.guild or not ctx.command:
         return True
 
@@ -169,14 +281,12 @@ async def disabled_check(ctx: commands.Context[Jovanes]) -> bool:
         if cog.qualified_name == "Management":  # Check if it's the management cog
             return True
 
-        disabled = await bot.is_entity_disabled(cog, ctx.guild.id)
-        if disabled:
+        if bot.is_entity_disabled(cog, ctx.guild.id):
             raise EntityDisabled(commands.Cog)
 
     # Command check
 
-    disabled = await bot.is_entity_disabled(ctx.command, ctx.guild.id)
-    if disabled:
+    if bot.is_entity_disabled(ctx.command, ctx.guild.id):
         raise EntityDisabled(commands.Command)
 
     return True
@@ -190,10 +300,16 @@ async def main() -> None:
 
     token = os.getenv("TOKEN")
     if token:
-        async with bot, asqlite.create_pool(
-            "./database/database.db"
+        profile = ConnectionProfile.from_env()
+        stats = QueryStats(
+            slow_threshold=float(os.getenv("SQLITE_SLOW_QUERY_MS", "100"))
+        )
+        # The bot is closed first, so buffered results are flushed while the pool is still open
+        async with Database(
+            "./database/database.db", profile=profile, stats=stats
         ) as bot.pool, aiohttp.ClientSession() as bot._session:
-            await bot.start(token)
+            async with bot:
+                await bot.start(token)
     else:
         raise RuntimeError("No token was found in the envs.")
 
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Leaderboards register their queries on import, the registry is only complete with them loaded
+from helpers import leaderboards  # pylint: disable=unused-import
+from helpers import migrations, statements
+from helpers.database import ConnectionProfile, Database
+
+
+async def plan_registered_statements(path: str) -> Dict[str, List[str]]:
+    async with Database(path, profile=ConnectionProfile(), readers=1) as db:
+        async with db.acquire() as conn:
+            await migrations.migrate(conn)
+
+        async with db.acquire() as conn:
+            return await statements.explain(conn)
+
+
+def test_no_registered_statement_scans_a_table() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        plans = asyncio.run(
+            plan_registered_statements(os.path.join(directory, "database.db"))
+        )
+
+    assert set(plans) == set(statements.REGISTRY)
+    assert statements.full_scans(plans) == []
+
+
+def test_index_scans_count_as_full_scans() -> None:
+    assert statements.is_full_scan("SCAN trivia")
+    assert statements.is_full_scan("SCAN trivia USING COVERING INDEX trivia_rank")
+    assert statements.is_full_scan("SCAN trivia USING INDEX trivia_rank")
+    assert not statements.is_full_scan("SCAN CONSTANT ROW")
+    assert not statements.is_full_scan(
+        "SEARCH trivia USING INDEX trivia_rank (guild_id=?)"
+    )
+
+
+if __name__ == "__main__":
+    test_no_registered_statement_scans_a_table()
+    test_index_scans_count_as_full_scans()
+    print(f"{len(statements.REGISTRY)} statement(s) planned, no full scans.")